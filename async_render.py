@@ -0,0 +1,160 @@
+"""
+Renders maps from asyncio code without blocking the event loop
+
+    async with AsyncRenderer(max_workers=4, timeout=30) as renderer:
+        images = await renderer.render_map(Path("fusion/complex.json"), ["svg", "png"])
+
+or `await render_map(...)` on a renderer shared by the whole process. Maps
+are drawn on a fixed pool of warm worker processes (or threads, with
+processes=False). However many renders are awaited at once only max_workers
+are handed to the pool, the rest wait their turn in the event loop, where
+cancelling one or timing it out costs nothing.
+
+A map that's already being drawn can't be stopped. Cancelling it (or timing
+out) stops the wait and the image is thrown away, but the worker stays busy
+until it's done.
+"""
+from __future__ import annotations
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import suppress
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+import asyncio
+import os
+import threading
+
+from plot_map import SUBCAT_MARKER_MAP, render_context, render_wardley_map
+from render import figure_pool, warm_up
+
+
+_default_renderer: Optional[AsyncRenderer] = None
+_default_renderer_lock = threading.Lock()
+
+
+def _render_images(
+    data_path: Path, image_formats: Sequence[str], figure_pool_size: int
+) -> Dict[str, bytes]:
+    with render_context(figure_pool(figure_pool_size)) as canvas:
+        return render_wardley_map(data_path, SUBCAT_MARKER_MAP, image_formats, canvas=canvas)
+
+
+class AsyncRenderer:
+    """
+    A pool of max_workers (defaults to the number of CPUs) drawing maps for
+    one event loop at a time. The workers start on the first render, or when
+    entering it with async with. timeout is the default for every render, in
+    seconds, None to wait as long as it takes
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        processes: bool = True,
+        timeout: Optional[float] = None
+    ) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.processes = processes
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.processes:
+                    self._executor = ProcessPoolExecutor(self.max_workers, initializer=warm_up)
+                else:
+                    # threads share the process's imports and text size cache already
+                    self._executor = ThreadPoolExecutor(self.max_workers)
+            return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # a semaphore belongs to the loop it's first waited on
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._loop, self._slots = loop, asyncio.Semaphore(self.max_workers)
+        return self._slots
+
+    async def start(self) -> None:
+        """
+        Starts (and warms up) every worker now rather than on the first renders
+        """
+        executor = self._get_executor()
+        # processes only start when there's work waiting for them
+        await asyncio.gather(*(
+            asyncio.wrap_future(executor.submit(int)) for _ in range(self.max_workers)))
+
+    async def render_map(
+        self,
+        data_path: Path,
+        image_formats: Sequence[str] = ("svg",),
+        timeout: Optional[float] = None
+    ) -> Dict[str, bytes]:
+        """
+        The map at data_path drawn once and returned in each format. Raises
+        asyncio.TimeoutError after timeout seconds (the renderer's if not given)
+        """
+        timeout = self.timeout if timeout is None else timeout
+        return await asyncio.wait_for(self._render(data_path, list(image_formats)), timeout)
+
+    async def _render(self, data_path: Path, image_formats: Sequence[str]) -> Dict[str, bytes]:
+        loop = asyncio.get_running_loop()
+        slots = self._get_slots()
+        await slots.acquire()
+        try:
+            future = self._get_executor().submit(
+                _render_images, data_path, image_formats,
+                1 if self.processes else self.max_workers)
+        except BaseException:
+            slots.release()
+            raise
+
+        def release_slot(_: Future) -> None:
+            # the loop may be gone by the time an abandoned render finishes
+            with suppress(RuntimeError):
+                loop.call_soon_threadsafe(slots.release)
+
+        # the slot's free when the worker is, not when the caller stops waiting
+        future.add_done_callback(release_slot)
+        return await asyncio.wrap_future(future)
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stops the workers, dropping renders that haven't started
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self) -> AsyncRenderer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await asyncio.to_thread(self.close)
+
+
+def default_renderer() -> AsyncRenderer:
+    """
+    The renderer render_map uses, made on first use
+    """
+    global _default_renderer
+    with _default_renderer_lock:
+        if _default_renderer is None:
+            _default_renderer = AsyncRenderer()
+    return _default_renderer
+
+
+async def render_map(
+    data_path: Path,
+    image_formats: Sequence[str] = ("svg",),
+    timeout: Optional[float] = None
+) -> Dict[str, bytes]:
+    """
+    The map at data_path drawn once and returned in each format, on the
+    default renderer
+    """
+    return await default_renderer().render_map(data_path, image_formats, timeout)
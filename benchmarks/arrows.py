@@ -0,0 +1,62 @@
+"""
+Artist count and wall time for drawing evolution arrows, an InertiaArrow per
+arrow against the per arrow type collections in `plot_arrow`
+
+Run from the repo root with `python -m benchmarks.arrows`
+"""
+from io import BytesIO
+from time import perf_counter
+from typing import Callable
+
+from plot_map import InertiaArrow, new_figure, plot_arrow, setup_plot
+from wardley_mappoltlib.node_table import NodeTable, node_table_from_node_data
+from wardley_mappoltlib.nodes import Arrow
+
+from benchmarks.synthetic import synthetic_map
+
+
+# about a fifth of synthetic nodes have an arrow
+NODE_COUNTS = [500, 5_000, 50_000]
+
+
+def per_arrow_lines(nodes: NodeTable, ax) -> None:
+    """
+    The old renderer, one InertiaArrow per arrow
+    """
+    for node_row, evolution, evolution_start, type_idx in zip(
+        nodes.arrow_node,
+        nodes.arrow_evolution,
+        nodes.arrow_evolution_start,
+        nodes.arrow_type_idx
+    ):
+        an_arrow = Arrow(evolution, evolution_start, nodes.arrow_types[type_idx])
+        ax.add_line(InertiaArrow.from_arrow(an_arrow, nodes.visibility[node_row]))
+
+
+def time_renderer(renderer: Callable, n_nodes: int):
+    data = synthetic_map(n_nodes)
+    nodes = node_table_from_node_data(data["nodes"])
+    fig = new_figure()
+    ax = fig.add_subplot()
+    setup_plot(ax)
+    n_artists = len(ax.get_children())
+
+    start = perf_counter()
+    renderer(nodes, ax)
+    build = perf_counter() - start
+
+    start = perf_counter()
+    fig.savefig(BytesIO(), format="svg")
+    write = perf_counter() - start
+    return len(nodes.arrow_node), len(ax.get_children()) - n_artists, build, write
+
+
+if __name__ == "__main__":
+    print(f"{'renderer':>12} {'arrows':>7} {'artists':>8} {'build s':>8} {'svg s':>8}")
+    for n_nodes in NODE_COUNTS:
+        for name, renderer in [
+            ("per-arrow", per_arrow_lines),
+            ("collection", plot_arrow)
+        ]:
+            n_arrows, n_artists, build, write = time_renderer(renderer, n_nodes)
+            print(f"{name:>12} {n_arrows:>7} {n_artists:>8} {build:>8.3f} {write:>8.3f}")
@@ -0,0 +1,56 @@
+"""
+Hundreds of concurrent renders through async_render, how long they take and
+how late the event loop gets to a 10 ms tick while they're going, then a
+batch with a timeout too short for most of them
+
+Run from the repo root with `python -m benchmarks.async_render [workers]`
+"""
+from pathlib import Path
+from time import perf_counter
+import asyncio
+import sys
+
+from async_render import AsyncRenderer
+
+
+MAP = Path(__file__).parent.parent / "fusion" / "very-simplified.json"
+N_RENDERS = 200
+TICK = 0.01
+
+
+async def ticker(lags):
+    while True:
+        start = perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(perf_counter() - start - TICK)
+
+
+async def main(workers):
+    async with AsyncRenderer(max_workers=workers) as renderer:
+        lags = []
+        tick_task = asyncio.create_task(ticker(lags))
+        start = perf_counter()
+        images = await asyncio.gather(*(renderer.render_map(MAP) for _ in range(N_RENDERS)))
+        elapsed = perf_counter() - start
+        tick_task.cancel()
+        assert all(image["svg"] for image in images)
+        print(
+            f"{N_RENDERS} renders on {workers} workers {elapsed:6.2f} s, "
+            f"{elapsed/N_RENDERS*1000:5.1f} ms each, "
+            f"worst event loop lag {max(lags)*1000:5.1f} ms")
+
+        start = perf_counter()
+        results = await asyncio.gather(
+            *(renderer.render_map(MAP, timeout=0.5) for _ in range(N_RENDERS)),
+            return_exceptions=True)
+        timed_out = sum(isinstance(result, asyncio.TimeoutError) for result in results)
+        print(
+            f"0.5 s timeout: {N_RENDERS - timed_out} rendered, {timed_out} timed out, "
+            f"{perf_counter() - start:5.2f} s")
+
+        # the pool's still usable after the cancellations
+        await renderer.render_map(MAP)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2))
@@ -0,0 +1,49 @@
+"""
+File size and load time of synthetic maps as pretty-printed JSON (like the
+maps in the repo) against the binary format, and the binary format back to
+JSON data
+
+Run from the repo root with `python -m benchmarks.binary_map`
+"""
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+
+from wardley_mappoltlib.binary_map import binary_map_data, load_binary_table, write_binary_map
+from wardley_mappoltlib.json_stream import load_node_table
+
+from benchmarks.synthetic import synthetic_map
+
+
+SIZES = [10_000, 100_000]
+REPEATS = 5
+
+
+def best_of(load, path) -> float:
+    times = []
+    for _ in range(REPEATS):
+        start = perf_counter()
+        load(path)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    with TemporaryDirectory() as tmp_dir:
+        for n_nodes in SIZES:
+            data = synthetic_map(n_nodes, n_interchanges=n_nodes//100)
+            json_path = Path(tmp_dir) / f"{n_nodes}.json"
+            json_path.write_text(json.dumps(data, indent=4))
+            binary_path = json_path.with_suffix(".wmap")
+            write_binary_map(data, binary_path)
+            assert binary_map_data(binary_path) == data
+
+            print(f"{n_nodes} nodes")
+            for name, path, load in [
+                ("JSON", json_path, load_node_table),
+                ("binary", binary_path, load_binary_table),
+                ("binary to JSON data", binary_path, binary_map_data),
+            ]:
+                print(f"{name:>20} {path.stat().st_size/1024/1024:6.2f} MB "
+                      f"{best_of(load, path)*1000:8.1f} ms")
@@ -0,0 +1,69 @@
+"""
+Artist count and wall time for drawing dependency edges, per-edge `plt.plot`
+against the `LineCollection` renderer in `plot_connecting_lines`
+
+Run from the repo root with `python -m benchmarks.connecting_lines`
+"""
+from io import BytesIO
+from time import perf_counter
+from typing import Callable
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib import pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+from plot_map import plot_connecting_lines  # noqa: E402
+
+
+EDGE_COUNTS = [100, 1_000, 10_000]
+
+
+def per_edge_lines(segments, optional, ax) -> None:
+    """
+    The old renderer, one Line2D per edge
+    """
+    for ((x_node, y_node), (x_child, y_child)), opt in zip(segments, optional):
+        ax.plot(
+            [x_node, x_child],
+            [y_node, y_child],
+            c="lightgrey" if opt else "darkgrey",
+            ls="-." if opt else "--",
+            zorder=-1
+        )
+
+
+def random_edges(n_edges: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    segments = rng.uniform(0, 1, (n_edges, 2, 2))*(4, 1.1)
+    optional = rng.random(n_edges) < 0.2
+    return segments, optional
+
+
+def time_renderer(renderer: Callable, n_edges: int):
+    segments, optional = random_edges(n_edges)
+    fig = plt.figure(figsize=[12.8, 9.6])
+    ax = fig.add_subplot()
+
+    start = perf_counter()
+    renderer(segments, optional, ax)
+    build = perf_counter() - start
+
+    start = perf_counter()
+    fig.savefig(BytesIO(), format="svg")
+    write = perf_counter() - start
+
+    n_artists = len(ax.lines) + len(ax.collections)
+    plt.close(fig)
+    return n_artists, build, write
+
+
+if __name__ == "__main__":
+    print(f"{'renderer':>12} {'edges':>7} {'artists':>8} {'build s':>8} {'svg s':>8}")
+    for n_edges in EDGE_COUNTS:
+        for name, renderer in [
+            ("per-edge", per_edge_lines),
+            ("collection", plot_connecting_lines)
+        ]:
+            n_artists, build, write = time_renderer(renderer, n_edges)
+            print(f"{name:>12} {n_edges:>7} {n_artists:>8} {build:>8.3f} {write:>8.3f}")
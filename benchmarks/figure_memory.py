@@ -0,0 +1,62 @@
+"""
+Peak memory over a long run of renders: new figures left to the garbage
+collector (how render_wardley_map used to work), render_context releasing a
+new figure after each map, and render_context on a FigurePool
+
+Each way runs in its own process, peak RSS only ever goes up. Run from the
+repo root with `python -m benchmarks.figure_memory`
+"""
+from pathlib import Path
+from time import perf_counter
+import subprocess
+import sys
+
+from plot_map import (
+    SUBCAT_MARKER_MAP, FigurePool, draw_wardley_map_from_json, figure_images, plot_legend,
+    render_context, render_wardley_map
+)
+from render import peak_rss_mb
+
+
+DATA_PATH = Path(__file__).parent.parent / "fusion" / "very-simplified.json"
+N_RENDERS = 150
+REPORT_EVERY = 50
+
+
+def unreleased() -> None:
+    ax, nodes = draw_wardley_map_from_json(DATA_PATH, SUBCAT_MARKER_MAP)
+    plot_legend(ax, nodes)
+    figure_images(ax.figure, ["png"])
+
+
+def released() -> None:
+    render_wardley_map(DATA_PATH, SUBCAT_MARKER_MAP, ["png"])
+
+
+POOL = FigurePool()
+
+
+def pooled() -> None:
+    with render_context(POOL) as canvas:
+        render_wardley_map(DATA_PATH, SUBCAT_MARKER_MAP, ["png"], canvas=canvas)
+
+
+RENDERERS = {"unreleased": unreleased, "released": released, "pooled": pooled}
+
+
+def run(name: str) -> None:
+    start = perf_counter()
+    for i in range(1, N_RENDERS + 1):
+        RENDERERS[name]()
+        if not i % REPORT_EVERY:
+            print(f"{name:>10} {i:>4} renders {peak_rss_mb():>6.0f} MB peak", flush=True)
+    print(f"{name:>10} {(perf_counter() - start)/N_RENDERS*1e3:>6.1f} ms/render")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        for name in RENDERERS:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.figure_memory", name], check=True)
@@ -0,0 +1,48 @@
+"""
+Cold import time of plot_map via `python -X importtime`, exits non-zero if it
+goes over budget or if it imports something that should be lazy
+
+Run from the repo root with `python -m benchmarks.import_time [budget seconds]`
+"""
+import subprocess
+import sys
+
+
+MODULE = "plot_map"
+BUDGET_SECONDS = 1.0
+# only wanted when labels are moved, or there's a window to show
+LAZY_MODULES = ["scipy", "adjustText", "matplotlib.pyplot"]
+
+
+def cumulative_import_times(module: str):
+    """
+    {module: cumulative seconds} from a fresh interpreter's -X importtime
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        times[name.strip()] = int(cumulative_us)/1e6
+    return times
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_SECONDS
+    times = cumulative_import_times(MODULE)
+
+    failures = []
+    print(f"import {MODULE} {times[MODULE]:.3f} s (budget {budget:.3f} s)")
+    if times[MODULE] > budget:
+        failures.append(f"{MODULE} took {times[MODULE]:.3f} s")
+    for lazy_module in LAZY_MODULES:
+        if lazy_module in times:
+            failures.append(f"{lazy_module} imported ({times[lazy_module]:.3f} s)")
+
+    for failure in failures:
+        print("FAILED", failure)
+    sys.exit(1 if failures else 0)
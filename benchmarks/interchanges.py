@@ -0,0 +1,64 @@
+"""
+Wall time for drawing interchange boxes, a Rectangle per interchange (each
+recomputing the marker size) against the single PatchCollection in
+`plot_interchanges`
+
+Run from the repo root with `python -m benchmarks.interchanges`
+"""
+from io import BytesIO
+from time import perf_counter
+from typing import Callable
+
+from matplotlib import patches
+
+from plot_map import marker_data_size, new_figure, plot_interchanges, setup_plot
+from wardley_mappoltlib.node_table import NodeTable, node_table_from_node_data
+
+from benchmarks.synthetic import synthetic_map
+
+
+INTERCHANGE_COUNTS = [10, 100, 1_000]
+
+
+def per_interchange_patches(ax, nodes: NodeTable) -> None:
+    """
+    The old renderer, one patch per interchange
+    """
+    for row in nodes.interchange_mask.nonzero()[0]:
+        data_width, data_height = marker_data_size(ax)
+        ax.add_patch(patches.Rectangle(
+            (nodes.evolution_min[row] - data_width, nodes.visibility[row] - data_height),
+            nodes.evolution_max[row] - nodes.evolution_min[row] + 2*data_width,
+            2*data_height,
+            fill=False,
+            zorder=-1
+        ))
+        nodes.visibility[row] += data_height
+
+
+def time_renderer(renderer: Callable, n_interchanges: int):
+    data = synthetic_map(n_interchanges*4, n_interchanges=n_interchanges)
+    nodes = node_table_from_node_data(data["nodes"], data["interchanges"])
+    fig = new_figure()
+    ax = fig.add_subplot()
+    setup_plot(ax)
+
+    start = perf_counter()
+    renderer(ax, nodes)
+    build = perf_counter() - start
+
+    start = perf_counter()
+    fig.savefig(BytesIO(), format="svg")
+    write = perf_counter() - start
+    return build, write
+
+
+if __name__ == "__main__":
+    print(f"{'renderer':>14} {'boxes':>6} {'build s':>8} {'svg s':>8}")
+    for n_interchanges in INTERCHANGE_COUNTS:
+        for name, renderer in [
+            ("per-patch", per_interchange_patches),
+            ("collection", plot_interchanges)
+        ]:
+            build, write = time_renderer(renderer, n_interchanges)
+            print(f"{name:>14} {n_interchanges:>6} {build:>8.4f} {write:>8.3f}")
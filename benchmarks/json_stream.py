@@ -0,0 +1,47 @@
+"""
+Peak Python memory and wall time loading a big map file into a NodeTable,
+json.load against the streaming loader
+
+Run from the repo root with `python -m benchmarks.json_stream`
+"""
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import tracemalloc
+
+from wardley_mappoltlib.json_stream import load_node_table
+from wardley_mappoltlib.node_table import node_table_from_node_data
+
+from benchmarks.synthetic import synthetic_map
+
+
+N_NODES = 100_000
+
+
+def json_load(data_path: Path) -> None:
+    with data_path.open("r") as data_fh:
+        data = json.load(data_fh)
+    node_table_from_node_data(data["nodes"], data["interchanges"])
+
+
+def measure(load, data_path: Path):
+    tracemalloc.start()
+    start = perf_counter()
+    load(data_path)
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == "__main__":
+    with TemporaryDirectory() as tmp_dir:
+        data_path = Path(tmp_dir) / "map.json"
+        with data_path.open("w") as data_fh:
+            json.dump(synthetic_map(N_NODES, n_interchanges=100), data_fh, indent=4)
+        print(f"{N_NODES} nodes, {data_path.stat().st_size/1e6:.1f} MB of JSON")
+
+        for name, load in [("json.load", json_load), ("streaming", load_node_table)]:
+            elapsed, peak = measure(load, data_path)
+            print(f"{name:>10} {elapsed:>7.3f} s {peak/1e6:>8.1f} MB peak")
@@ -0,0 +1,136 @@
+"""
+Wall time and overlaps left for moving labels, adjustText against
+place_labels (move_annotations_away's two engines), on complex.json and
+synthetic maps up to 5,000 nodes
+
+Both get the same label boxes and the same obstacle points (node markers and
+points sampled along the dependency lines), in display units. adjustText is
+skipped above ADJUST_TEXT_MAX_LABELS, on the denser maps it takes minutes or
+runs out of memory.
+
+"cover" is the labels' total area over the axes', from 1,000 nodes the labels
+can't all fit so no engine gets to 0.
+
+Run from the repo root with `python -m benchmarks.label_placement`
+"""
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Tuple
+
+import numpy as np
+
+from plot_map import (
+    SUBCAT_MARKER_MAP,
+    build_connecting_lines,
+    new_figure,
+    plot_annotate_nodes,
+    rescale_nodes,
+    sample_edge_points,
+    setup_plot
+)
+from wardley_mappoltlib.json_stream import load_node_table
+from wardley_mappoltlib.label_placement import place_labels
+from wardley_mappoltlib.node_table import NodeTable, node_table_from_node_data
+
+from benchmarks.synthetic import SUBCATS, synthetic_map
+
+
+COMPLEX_MAP = Path(__file__).parent.parent / "fusion" / "complex.json"
+NODE_COUNTS = [100, 1_000, 2_000, 5_000]
+ADJUST_TEXT_MAX_LABELS = 100
+EXPAND_POINTS = (1.1, 1.2)
+
+
+def annotated_map(load_nodes: Callable[[], NodeTable]):
+    """
+    The labelled axes, without arrows or lines, plus the obstacle points
+    """
+    nodes = load_nodes()
+    rescale_nodes(nodes)
+    fig = new_figure()
+    ax = fig.add_subplot()
+    setup_plot(ax)
+    marker_map = {**{subcat: {"marker": "o"} for subcat in SUBCATS}, **SUBCAT_MARKER_MAP}
+    annotations = plot_annotate_nodes(nodes, ax, marker_map)
+    segments, _ = build_connecting_lines(nodes)
+    points = np.concatenate([
+        sample_edge_points(segments),
+        [ann.xy for ann in annotations]
+    ])
+    return ax, annotations, points
+
+
+def label_boxes(ax, annotations) -> np.ndarray:
+    renderer = ax.figure.canvas.get_renderer()
+    return np.array([ann.get_window_extent(renderer).extents for ann in annotations])
+
+
+def count_overlaps(boxes: np.ndarray, points: np.ndarray) -> Tuple[int, int]:
+    """
+    (label pairs overlapping, points under labels), brute force
+    """
+    centres = (boxes[:, :2] + boxes[:, 2:])/2
+    size = boxes[:, 2:] - boxes[:, :2]
+    n_labels = n_points = 0
+    for i, (centre, half_size) in enumerate(zip(centres, size/2)):
+        n_labels += np.count_nonzero(
+            (np.abs(centres[i + 1:] - centre) < half_size + size[i + 1:]/2).all(axis=1))
+        n_points += np.count_nonzero(
+            (np.abs(points - centre) < half_size*EXPAND_POINTS).all(axis=1))
+    return n_labels, n_points
+
+
+def time_place_labels(load_nodes: Callable[[], NodeTable]):
+    ax, annotations, points = annotated_map(load_nodes)
+    boxes = label_boxes(ax, annotations)
+    display_points = ax.transData.transform(points)
+    start = perf_counter()
+    offsets, _ = place_labels(
+        boxes, display_points, bounds=ax.bbox.extents, expand_points=EXPAND_POINTS)
+    elapsed = perf_counter() - start
+    x0, y0, x1, y1 = ax.bbox.extents
+    cover = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1).sum()/((x1 - x0)*(y1 - y0))
+    return elapsed, count_overlaps(boxes, display_points), \
+        count_overlaps(boxes + np.hstack([offsets, offsets]), display_points), cover
+
+
+def time_adjust_text(load_nodes: Callable[[], NodeTable]):
+    from adjustText import adjust_text
+
+    ax, annotations, points = annotated_map(load_nodes)
+    start = perf_counter()
+    adjust_text(
+        annotations, x=points[:, 0], y=points[:, 1], ax=ax, expand_points=EXPAND_POINTS)
+    elapsed = perf_counter() - start
+    return elapsed, count_overlaps(
+        label_boxes(ax, annotations), ax.transData.transform(points))
+
+
+def report(name: str, n_labels: int, load_nodes: Callable[[], NodeTable]) -> None:
+    """
+    Each engine gets its own table, rescale_nodes works in place
+    """
+    elapsed, before, after, cover = time_place_labels(load_nodes)
+    print(f"{name:>12} {n_labels:>6} {'':>11} {before[0]:>6} {before[1]:>8} {'':>8} {cover:>6.2f}")
+    print(f"{'':>12} {'':>6} {'grid':>11} {after[0]:>6} {after[1]:>8} {elapsed:>8.3f}")
+    if n_labels <= ADJUST_TEXT_MAX_LABELS:
+        try:
+            elapsed, after = time_adjust_text(load_nodes)
+        except MemoryError:
+            print(f"{'':>12} {'':>6} {'adjustText':>11} out of memory")
+            return
+        print(f"{'':>12} {'':>6} {'adjustText':>11} {after[0]:>6} {after[1]:>8} {elapsed:>8.3f}")
+
+
+if __name__ == "__main__":
+    print(
+        f"{'map':>12} {'labels':>6} {'engine':>11} {'label':>6} {'point':>8} {'s':>8} "
+        f"{'cover':>6}")
+    complex_nodes = load_node_table(COMPLEX_MAP)[1]
+    report("complex", len(complex_nodes), lambda: load_node_table(COMPLEX_MAP)[1])
+    for n_nodes in NODE_COUNTS:
+        data = synthetic_map(n_nodes, mean_dependencies=1.0)
+        report(
+            "synthetic", n_nodes,
+            lambda: node_table_from_node_data(data["nodes"], data["interchanges"])
+        )
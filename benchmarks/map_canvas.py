@@ -0,0 +1,38 @@
+"""
+Per-map cost of drawing a batch of 1,000 maps, each on a new figure against
+all on one reused MapCanvas from a FigurePool (what render.py's workers do)
+
+Drawing only, saving costs the same either way. Run from the repo root with
+`python -m benchmarks.map_canvas`
+"""
+from pathlib import Path
+from time import perf_counter
+
+from plot_map import (
+    SUBCAT_MARKER_MAP, FigurePool, draw_wardley_map_from_json, plot_legend, render_context
+)
+
+
+DATA_PATH = Path(__file__).parent.parent / "fusion" / "very-simplified.json"
+N_MAPS = 1_000
+
+
+def new_figures() -> None:
+    for _ in range(N_MAPS):
+        ax, nodes = draw_wardley_map_from_json(DATA_PATH, SUBCAT_MARKER_MAP)
+        plot_legend(ax, nodes)
+
+
+def reused_canvas() -> None:
+    with render_context(FigurePool()) as canvas:
+        for _ in range(N_MAPS):
+            ax, nodes = draw_wardley_map_from_json(DATA_PATH, SUBCAT_MARKER_MAP, canvas=canvas)
+            plot_legend(ax, nodes)
+
+
+if __name__ == "__main__":
+    for name, draw_batch in [("new figure", new_figures), ("map canvas", reused_canvas)]:
+        start = perf_counter()
+        draw_batch()
+        elapsed = perf_counter() - start
+        print(f"{name:>10} {N_MAPS} maps {elapsed:>7.2f} s {elapsed/N_MAPS*1e3:>7.2f} ms/map")
@@ -0,0 +1,51 @@
+"""
+Loader throughput of nodes_from_node_data, in nodes per second, against the
+old deepcopy-then-pop construction
+
+Run from the repo root with `python -m benchmarks.node_loading`
+"""
+from copy import deepcopy
+from time import perf_counter
+from typing import List
+
+from wardley_mappoltlib.nodes import Arrow, Node, NodeDataType, nodes_from_node_data
+
+from benchmarks.synthetic import synthetic_map
+
+
+N_NODES = 50_000
+
+
+def deepcopy_node_from_dict(data: NodeDataType) -> Node:
+    """
+    Node.from_dict as it was, copying data before popping keys off it
+    """
+    _data_to_modify = deepcopy(data)
+    arrows: List[Arrow] = []
+    if "arrows" in _data_to_modify:
+        if arrows_data := _data_to_modify.pop("arrows"):
+            arrows = []
+            for arrow_datum in arrows_data:
+                _arrow_data = deepcopy(arrow_datum)
+                if "evolution_start" not in arrow_datum:
+                    _arrow_data["evolution_start"] = _data_to_modify["evolution"]
+                arrows.append(Arrow(**_arrow_data))
+    return Node(**_data_to_modify, arrows=arrows)
+
+
+def deepcopy_nodes_from_node_data(graph_data: List[NodeDataType]) -> List[Node]:
+    return list(deepcopy_node_from_dict(gd) for gd in graph_data)
+
+
+if __name__ == "__main__":
+    graph_data = synthetic_map(N_NODES)["nodes"]
+
+    for name, load in [
+        ("deepcopy", deepcopy_nodes_from_node_data),
+        ("zero-copy", nodes_from_node_data)
+    ]:
+        start = perf_counter()
+        nodes = load(graph_data)
+        elapsed = perf_counter() - start
+        assert len(nodes) == N_NODES
+        print(f"{name:>10} {N_NODES/elapsed:>12,.0f} nodes/s")
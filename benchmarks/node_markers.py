@@ -0,0 +1,38 @@
+"""
+Scaling of group_node_markers, the marker bucketing in plot_annotate_nodes
+
+Time per node should stay flat from 1k to 100k nodes. Exits non-zero if the
+per-node cost at the largest size is more than MAX_GROWTH times the smallest.
+
+Run from the repo root with `python -m benchmarks.node_markers`
+"""
+import sys
+from timeit import timeit
+
+from plot_map import group_node_markers
+from wardley_mappoltlib.node_table import node_table_from_node_data
+
+from benchmarks.synthetic import SUBCATS, synthetic_map
+
+
+NODE_COUNTS = [1_000, 10_000, 100_000]
+MAX_GROWTH = 3.0
+SUBCAT_MARKER_MAP = {subcat: {"marker": "^"} for subcat in SUBCATS}
+
+
+if __name__ == "__main__":
+    per_node = []
+    for n_nodes in NODE_COUNTS:
+        data = synthetic_map(n_nodes, n_interchanges=n_nodes//100)
+        nodes = node_table_from_node_data(data["nodes"], data["interchanges"])
+        repeats = 10
+        elapsed = timeit(
+            lambda: group_node_markers(nodes, SUBCAT_MARKER_MAP), number=repeats
+        )/repeats
+        per_node.append(elapsed/n_nodes)
+        print(f"{n_nodes:>7} nodes {elapsed*1e3:>8.2f} ms {per_node[-1]*1e9:>6.1f} ns/node")
+
+    growth = per_node[-1]/per_node[0]
+    print(f"per-node cost growth {growth:.2f}x")
+    if growth > MAX_GROWTH:
+        sys.exit(1)
@@ -0,0 +1,35 @@
+"""
+Load a big synthetic map through Node objects (load and link the graph only)
+against the NodeTable (load, rescale and build the dependency lines)
+
+Run from the repo root with `python -m benchmarks.node_table`
+"""
+from time import perf_counter
+
+from plot_map import build_connecting_lines, rescale_nodes
+from wardley_mappoltlib.node_table import node_table_from_node_data
+from wardley_mappoltlib.nodes import node_graph_from_map_data
+
+from benchmarks.synthetic import synthetic_map
+
+
+N_NODES = 50_000
+
+
+def node_objects(data) -> None:
+    node_graph_from_map_data(data["nodes"], data["interchanges"])
+
+
+def node_table(data) -> None:
+    nodes = node_table_from_node_data(data["nodes"], data["interchanges"])
+    rescale_nodes(nodes)
+    build_connecting_lines(nodes)
+
+
+if __name__ == "__main__":
+    data = synthetic_map(N_NODES, n_interchanges=1_000)
+
+    for name, load in [("Node objects", node_objects), ("NodeTable", node_table)]:
+        start = perf_counter()
+        load(data)
+        print(f"{name:>12} {N_NODES} nodes {perf_counter() - start:.3f} s")
@@ -0,0 +1,51 @@
+"""
+Visibility rescaling on 100k nodes, the old per-node loops against each of
+rescale_nodes' scalings on a NodeTable
+
+Run from the repo root with `python -m benchmarks.rescale_nodes`
+"""
+from timeit import timeit
+
+from plot_map import VISIBILITY_BOOST, rescale_nodes
+from wardley_mappoltlib.node_table import node_table_from_node_data
+from wardley_mappoltlib.nodes import Node
+
+from benchmarks.synthetic import synthetic_map
+
+
+N_NODES = 100_000
+REPEATS = 10
+
+
+def per_node_loops(nodes) -> None:
+    """
+    The old rescale_nodes, over Node objects
+    """
+    vis_min = min([n.visibility for n in nodes])
+    vis_max = max([n.visibility for n in nodes])
+    scale_factor = vis_max - vis_min
+    for node in nodes:
+        node.visibility = (
+            scale_factor - (node.visibility - vis_min))/scale_factor
+    for node in nodes:
+        node.visibility += VISIBILITY_BOOST
+
+
+if __name__ == "__main__":
+    data = synthetic_map(N_NODES, n_interchanges=N_NODES//100)
+    node_objects = [Node.from_dict(node_datum) for node_datum in data["nodes"]]
+    nodes = node_table_from_node_data(data["nodes"], data["interchanges"])
+    raw_visibility = nodes.visibility.copy()
+
+    def table_rescale(**kwargs):
+        nodes.visibility[:] = raw_visibility
+        rescale_nodes(nodes, **kwargs)
+
+    for name, rescale in [
+        ("per-node", lambda: per_node_loops(node_objects)),
+        ("min-max", lambda: table_rescale()),
+        ("rank", lambda: table_rescale(scaling="rank")),
+        ("fixed", lambda: table_rescale(scaling="fixed", value_range=(0, 2))),
+    ]:
+        elapsed = timeit(rescale, number=REPEATS)/REPEATS
+        print(f"{name:>10} {N_NODES} nodes {elapsed*1e3:>8.2f} ms")
@@ -0,0 +1,53 @@
+"""
+Request latency against a running serve.py, one render per request (each
+request's map has a new title so the cache and ETags don't answer it) and
+then the same map again with its ETag
+
+Start the server first, `python serve.py --no-cache`, then run from the repo
+root with `python -m benchmarks.serve`
+"""
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import json
+import sys
+
+
+MAPS = Path(__file__).parent.parent / "fusion"
+URL = "http://127.0.0.1:8765/render"
+N_REQUESTS = 20
+
+
+def post(map_data, image_format, etag=None):
+    request = Request(
+        f"{URL}?format={image_format}", data=json.dumps(map_data).encode(), method="POST")
+    if etag is not None:
+        request.add_header("If-None-Match", etag)
+    start = perf_counter()
+    try:
+        with urlopen(request) as response:
+            response.read()
+            status, etag = response.status, response.headers["ETag"]
+    except HTTPError as exc:
+        status = exc.code
+    return perf_counter() - start, status, etag
+
+
+if __name__ == "__main__":
+    map_path = Path(sys.argv[1]) if len(sys.argv) > 1 else MAPS / "very-simplified.json"
+    map_data = json.loads(map_path.read_text())
+    for image_format in ["svg", "png"]:
+        rendered, revalidated = [], []
+        for i in range(N_REQUESTS):
+            map_data["title"] = f"{map_path.stem} {image_format} {i}"
+            elapsed, status, etag = post(map_data, image_format)
+            assert status == 200, status
+            rendered.append(elapsed)
+            elapsed, status, _ = post(map_data, image_format, etag)
+            assert status == 304, status
+            revalidated.append(elapsed)
+        print(
+            f"{image_format} rendered median {median(rendered)*1000:>6.1f} ms, "
+            f"304 median {median(revalidated)*1000:>5.1f} ms")
@@ -0,0 +1,75 @@
+"""
+Getting a big loaded map into worker processes: each worker loading the JSON
+itself, the NodeTable pickled to each worker, and the NodeTable in shared
+memory with each worker attaching to it. Each worker task then sums over
+every column, the sort of read-only pass layout work does
+
+Run from the repo root with `python -m benchmarks.shared_table [n_nodes]`
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import sys
+
+import numpy as np
+
+from wardley_mappoltlib.json_stream import load_node_table
+from wardley_mappoltlib.shared_table import attached_node_table, shared_node_table
+
+from benchmarks.synthetic import synthetic_map
+
+
+N_TASKS = 16
+WORKERS = 2
+
+
+def column_sums(nodes) -> float:
+    return float(
+        nodes.evolution.sum() + nodes.visibility.sum() + nodes.dep_indices.sum()
+        + nodes.arrow_evolution.sum() + len(nodes.codes)
+    )
+
+
+def from_json(data_path: Path) -> float:
+    _, nodes = load_node_table(data_path)
+    return column_sums(nodes)
+
+
+def from_pickle(nodes) -> float:
+    return column_sums(nodes)
+
+
+def from_shared(shared) -> float:
+    with attached_node_table(shared) as nodes:
+        return column_sums(nodes)
+
+
+def timed(executor, work, arg) -> float:
+    start = perf_counter()
+    sums = list(executor.map(work, [arg]*N_TASKS))
+    elapsed = perf_counter() - start
+    assert np.allclose(sums, sums[0])
+    return elapsed
+
+
+if __name__ == "__main__":
+    n_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with TemporaryDirectory() as tmp_dir:
+        data_path = Path(tmp_dir) / "synthetic.json"
+        data_path.write_text(json.dumps(synthetic_map(n_nodes, n_interchanges=n_nodes//100)))
+        _, nodes = load_node_table(data_path)
+
+        with ProcessPoolExecutor(WORKERS) as executor, shared_node_table(nodes) as shared:
+            # start the workers before timing anything
+            list(executor.map(int, range(WORKERS)))
+            print(f"{n_nodes} nodes, {shared.nbytes/1024/1024:.1f} MB of columns, "
+                  f"{N_TASKS} tasks on {WORKERS} workers")
+            for name, work, arg in [
+                ("load JSON", from_json, data_path),
+                ("pickled", from_pickle, nodes),
+                ("shared", from_shared, shared),
+            ]:
+                elapsed = timed(executor, work, arg)
+                print(f"{name:>10} {elapsed:7.3f} s, {elapsed/N_TASKS*1000:7.1f} ms a task")
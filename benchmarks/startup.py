@@ -0,0 +1,54 @@
+"""
+Import-to-first-SVG latency in a fresh interpreter, headless against going
+through pyplot
+
+Run from the repo root with `python -m benchmarks.startup`
+"""
+from statistics import median
+import subprocess
+import sys
+
+
+REPEATS = 5
+DATA_PATH = "fusion/very-simplified.json"
+
+HEADLESS = f"""
+from time import perf_counter
+start = perf_counter()
+from pathlib import Path
+import sys
+from plot_map import SUBCAT_MARKER_MAP, render_wardley_map
+render_wardley_map(Path("{DATA_PATH}"), SUBCAT_MARKER_MAP, ["svg"])
+print(perf_counter() - start, "matplotlib.pyplot" in sys.modules)
+"""
+
+PYPLOT = f"""
+from time import perf_counter
+start = perf_counter()
+from io import BytesIO
+from pathlib import Path
+import sys
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib import pyplot as plt
+from plot_map import FIGSIZE, SUBCAT_MARKER_MAP, draw_wardley_map_from_json, plot_legend
+ax, nodes = draw_wardley_map_from_json(
+    Path("{DATA_PATH}"), SUBCAT_MARKER_MAP, plt.figure(figsize=FIGSIZE))
+plot_legend(ax, nodes)
+plt.savefig(BytesIO(), format="svg")
+print(perf_counter() - start, "matplotlib.pyplot" in sys.modules)
+"""
+
+
+def first_svg(script: str):
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[-2]), output[-1] == "True"
+
+
+if __name__ == "__main__":
+    for name, script in [("headless", HEADLESS), ("pyplot", PYPLOT)]:
+        runs = [first_svg(script) for _ in range(REPEATS)]
+        seconds = median(run[0] for run in runs)
+        print(f"{name:>9} {seconds:.3f} s to first SVG, pyplot imported: {runs[0][1]}")
@@ -0,0 +1,77 @@
+"""
+Synthetic Wardley Maps, in the same JSON schema as `fusion/*.json`, for the
+benchmarks
+"""
+from typing import Dict, List
+
+import numpy as np
+
+
+SUBCATS = ["Laser", "Targets", "Struct", "Plasma Physics"]
+ARROW_TYPES = ["driven", "inertia"]
+
+
+def synthetic_map(
+    n_nodes: int,
+    n_interchanges: int = 0,
+    mean_dependencies: float = 2.0,
+    seed: int = 0
+) -> Dict:
+    """
+    A random map with roughly `mean_dependencies` children per node
+
+    Dependencies only point at later nodes, so the graph is a DAG like a real
+    value chain. Interchanges group consecutive nodes sharing a visibility.
+    """
+    rng = np.random.default_rng(seed)
+    evolution = rng.uniform(0, 4, n_nodes).round(3)
+    visibility = rng.uniform(0, 2, n_nodes).round(3)
+    n_deps = rng.poisson(mean_dependencies, n_nodes)
+
+    members_per_interchange = 3
+    n_members = members_per_interchange*n_interchanges
+    interchange_nodes: List[List[int]] = [
+        list(range(n_nodes - n_members + i*members_per_interchange,
+                   n_nodes - n_members + (i + 1)*members_per_interchange))
+        for i in range(n_interchanges)
+    ]
+    for members in interchange_nodes:
+        visibility[members] = visibility[members[0]]
+
+    nodes = []
+    for idx in range(n_nodes):
+        children = rng.integers(idx + 1, n_nodes, n_deps[idx]) \
+            if idx + 1 < n_nodes else []
+        node = {
+            "code": f"N{idx}",
+            "title": f"Node\n{idx}",
+            "type": "Node",
+            "dependencies": [f"N{child}" for child in sorted(set(children))],
+            "visibility": float(visibility[idx]),
+            "evolution": float(evolution[idx])
+        }
+        if rng.random() < 0.3:
+            node["subcat"] = SUBCATS[rng.integers(len(SUBCATS))]
+        if rng.random() < 0.1:
+            node["optional"] = True
+        if rng.random() < 0.2:
+            node["arrows"] = [{
+                "evolution": float(min(evolution[idx] + 0.2, 4)),
+                "type": ARROW_TYPES[rng.integers(len(ARROW_TYPES))]
+            }]
+        nodes.append(node)
+
+    interchanges = [
+        {
+            "code": f"I{idx}",
+            "title": f"Interchange\n{idx}",
+            "interchanges": [f"N{member}" for member in members]
+        }
+        for idx, members in enumerate(interchange_nodes)
+    ]
+
+    return {
+        "title": f"Synthetic, {n_nodes} nodes",
+        "nodes": nodes,
+        "interchanges": interchanges
+    }
@@ -0,0 +1,51 @@
+"""
+Time to get every label's box on a batch of figures of the same map,
+get_window_extent per annotation against the process wide text_boxes cache
+
+Run from the repo root with `python -m benchmarks.text_metrics`
+"""
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+from plot_map import SUBCAT_MARKER_MAP, new_figure, plot_annotate_nodes, rescale_nodes, setup_plot
+from wardley_mappoltlib.json_stream import load_node_table
+from wardley_mappoltlib.text_metrics import text_boxes, text_extent
+
+
+COMPLEX_MAP = Path(__file__).parent.parent / "fusion" / "complex.json"
+N_FIGURES = 200
+
+
+def annotated_figure(nodes):
+    fig = new_figure()
+    ax = fig.add_subplot()
+    setup_plot(ax)
+    return ax, plot_annotate_nodes(nodes, ax, SUBCAT_MARKER_MAP)
+
+
+def window_extents(ax, annotations) -> np.ndarray:
+    renderer = ax.figure.canvas.get_renderer()
+    return np.array([ann.get_window_extent(renderer).extents for ann in annotations])
+
+
+def cached_extents(ax, annotations) -> np.ndarray:
+    anchors = ax.transData.transform([ann.xyann for ann in annotations])
+    return text_boxes(annotations, anchors, ax.figure.dpi)
+
+
+if __name__ == "__main__":
+    _, nodes = load_node_table(COMPLEX_MAP)
+    rescale_nodes(nodes)
+    figures = [annotated_figure(nodes) for _ in range(N_FIGURES)]
+
+    for name, measure in [("window extent", window_extents), ("cached", cached_extents)]:
+        start = perf_counter()
+        boxes = [measure(ax, annotations) for ax, annotations in figures]
+        elapsed = perf_counter() - start
+        print(f"{name:>14} {N_FIGURES} figures {elapsed:>7.3f} s")
+
+    reference = window_extents(*figures[0])
+    print(f"max difference {np.abs(boxes[0] - reference).max():.3g} px")
+    print(text_extent.cache_info())
@@ -0,0 +1,62 @@
+"""
+Draws a batch of synthetic maps one after another, on a thread pool and on a
+process pool, and checks the images all match the one-at-a-time ones
+
+Exits non-zero if any image differs, e.g. two maps drawn side by side in one
+process got in each other's way. Labels aren't moved, adjustText needs a
+couple of GB per map this size.
+
+Run from the repo root with `python -m benchmarks.thread_render`
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import sys
+
+from plot_map import SUBCAT_MARKER_MAP, FigurePool, render_context, render_wardley_map
+
+from benchmarks.synthetic import synthetic_map
+
+
+N_MAPS = 32
+N_NODES = 40
+WORKERS = 4
+
+# shared by the threads, a figure each
+POOL = FigurePool(WORKERS)
+
+
+def render_png(data_path: Path) -> bytes:
+    with render_context(POOL) as canvas:
+        return render_wardley_map(data_path, SUBCAT_MARKER_MAP, ["png"], canvas=canvas)["png"]
+
+
+if __name__ == "__main__":
+    with TemporaryDirectory() as data_dir:
+        data_paths = []
+        for seed in range(N_MAPS):
+            data_path = Path(data_dir) / f"map_{seed}.json"
+            data_path.write_text(json.dumps(
+                synthetic_map(N_NODES, n_interchanges=2, seed=seed)))
+            data_paths.append(data_path)
+
+        start = perf_counter()
+        serial = [render_png(data_path) for data_path in data_paths]
+        print(f"{'serial':>10} {N_MAPS} maps {perf_counter() - start:>6.2f} s")
+
+        images = {}
+        for name, pool in [("threads", ThreadPoolExecutor), ("processes", ProcessPoolExecutor)]:
+            with pool(max_workers=WORKERS) as executor:
+                start = perf_counter()
+                images[name] = list(executor.map(render_png, data_paths))
+                print(f"{name:>10} {N_MAPS} maps {perf_counter() - start:>6.2f} s")
+
+    failed = False
+    for name, pool_images in images.items():
+        mismatches = sum(image != serial_image for image, serial_image in zip(pool_images, serial))
+        print(f"{mismatches} {name} images differ from serial")
+        failed |= bool(mismatches)
+    if failed:
+        sys.exit(1)
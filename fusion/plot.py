@@ -1,14 +1,10 @@
 from pathlib import Path
-from os import getcwd
 
-from matplotlib import pyplot as plt
-import matplotlib.patches as mpatches
-
-from plot_map import draw_wardley_map_from_json
+from plot_map import SUBCAT_MARKER_MAP, render_wardley_map
 
 data_dir = Path("fusion")
 graph_path = data_dir / "data.json"
-draw_wardley_map_from_json(graph_path)
+images = render_wardley_map(graph_path, SUBCAT_MARKER_MAP, ["svg"])
 
 # rect = mpatches.Rectangle(
 #     (0, 0.0), 1.2, 0.49,
@@ -18,9 +14,7 @@ draw_wardley_map_from_json(graph_path)
 # plt.gca().add_patch(rect)
 
 image_path = data_dir / "automated.svg"
-plt.savefig(image_path)
-
-plt.show()
+image_path.write_bytes(images["svg"])
 
 # TODO
 # Add key
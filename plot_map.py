@@ -1,25 +1,42 @@
-from copy import copy
+from argparse import ArgumentParser
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
-import json
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import gc
 import os
 import math
+import sys
+import threading
 
-from adjustText import adjust_text
-from matplotlib import pyplot as plt
+from matplotlib.artist import Artist
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.figure import Figure
 from matplotlib.lines import Line2D
 from matplotlib.legend_handler import HandlerNpoints
 from matplotlib import patches
 import numpy as np
-from scipy import interpolate
 
-from wardley_mappoltlib.nodes import \
-    Arrow, build_node_graph, Interchange, Node, NodeDataType, NodesType, nodes_from_node_data
+from wardley_mappoltlib.binary_map import load_map_table
+from wardley_mappoltlib.export import export_figure, figure_images, image_format_of
+from wardley_mappoltlib.label_placement import place_labels
+from wardley_mappoltlib.node_table import NodeTable
+from wardley_mappoltlib.nodes import Arrow
+from wardley_mappoltlib.text_metrics import text_boxes
 
 
+# bump this when a change to the drawing code changes the images
+__version__ = "0.1.4"
+
+FIGSIZE = [12.8, 9.6]
 VISIBILITY_BOOST = 0.05
 MARKER_SIZE = 100
+INTERCHANGE_MARKER_STYLE = {"c": "white", "edgecolors": "black", "marker": "s"}
+DEFAULT_MARKER_STYLE = {"c": "white", "edgecolors": "black"}
+VISIBILITY_SCALINGS = ("min-max", "rank", "fixed")
+LABEL_ENGINES = ("adjustText", "grid")
+DEFAULT_LABEL_ENGINE = "grid"
 
 
 @dataclass
@@ -34,6 +51,14 @@ ARROW_STYLES = {
     "inertia": ArrowStyle("C0", "--", "Evolution")
 }
 
+SUBCAT_MARKER_MAP: Dict[str, str] = {
+    # , "edgecolors": "firebrick"},
+    "Laser": {"marker": "^", "c": "C2"},
+    "Targets": {"marker": "X", "c": "C3"},
+    "Struct": {"marker": "D", "c": "C4"},
+    "Plasma Physics": {"marker": "s", "c": "C5"}
+}
+
 
 def setup_plot(ax, max_evolution=4):
     """
@@ -41,15 +66,15 @@ def setup_plot(ax, max_evolution=4):
 
     Kinda janky and probably not super portable, but works for this use case
     """
-    plt.xlabel("Evolution", weight="bold", size=14)
-    plt.xlim([0, max_evolution])
+    ax.set_xlabel("Evolution", weight="bold", size=14)
+    ax.set_xlim([0, max_evolution])
 
     x_ticks = list(range(max_evolution))
     x_tick_labels = [
         "Genesis", "Custom Built", "Product (+ rental)", "Commodity (+ utility)"
     ][:len(x_ticks)]
 
-    plt.xticks(
+    ax.set_xticks(
         x_ticks,
         x_tick_labels,
         size=12
@@ -58,16 +83,16 @@ def setup_plot(ax, max_evolution=4):
         tick.set_horizontalalignment("left")
         tick.set_style("italic")
 
-    plt.vlines(
+    ax.vlines(
         range(5), -100, +100,
         linestyles=(0, (5, 5)), colors="lightgrey", zorder=-2)
 
     ax.spines["top"].set_visible(False)
 
-    plt.ylabel("Value Chain", weight="bold", size=14)
-    plt.ylim([0, 1.0 + 2*VISIBILITY_BOOST])
+    ax.set_ylabel("Value Chain", weight="bold", size=14)
+    ax.set_ylim([0, 1.0 + 2*VISIBILITY_BOOST])
 
-    plt.yticks(
+    ax.set_yticks(
         [0, 1],
         ["Invisible", "Visible"],
         size=12
@@ -82,65 +107,55 @@ def setup_plot(ax, max_evolution=4):
     ax.plot(0, 1, "^k", transform=ax.get_xaxis_transform(), clip_on=False)
 
 
-def plot_annotate_nodes(node_list: list[Node], ax, subcat_marker_map: Dict[str, str]):
-    # Sort out axis points
-
-    remaining: list[Node] = copy(node_list)
-
-    xx_interchange: list[float] = [
-        node.evolution for node in node_list if node.type == "interchange"
+def group_node_markers(
+    nodes: NodeTable, subcat_marker_map: Dict[str, str]
+) -> List[Tuple[np.ndarray, np.ndarray, Dict[str, str]]]:
+    """
+    Buckets the nodes into interchanges, each subcat in subcat_marker_map, then
+    everything else, in one pass. Returns (evolution, visibility, marker style)
+    for each bucket, in that order
+    """
+    marker_styles = [
+        INTERCHANGE_MARKER_STYLE, *subcat_marker_map.values(), DEFAULT_MARKER_STYLE
     ]
-    yy_interchange: list[float] = [
-        node.visibility for node in node_list if node.type == "interchange"
+    default_bucket = len(marker_styles) - 1
+
+    # bucket for each of nodes.subcats, the extra last entry is NO_SUBCAT (-1)
+    subcat_bucket = np.full(len(nodes.subcats) + 1, default_bucket, dtype=np.uint16)
+    for bucket, subcat in enumerate(subcat_marker_map, start=1):
+        if subcat in nodes.subcats:
+            subcat_bucket[nodes.subcats.index(subcat)] = bucket
+
+    node_bucket = subcat_bucket[nodes.subcat_idx]
+    node_bucket[nodes.interchange_mask] = 0
+
+    # stable sort of a small int type is a radix sort, so this is O(n)
+    order = np.argsort(node_bucket, kind="stable")
+    bounds = np.searchsorted(
+        node_bucket[order], np.arange(len(marker_styles) + 1))
+    xx = nodes.evolution[order]
+    yy = nodes.visibility[order]
+
+    return [
+        (xx[start:end], yy[start:end], marker_style)
+        for start, end, marker_style in zip(bounds[:-1], bounds[1:], marker_styles)
     ]
-    for node in node_list:
-        if node.type == "interchange":
-            remaining.remove(node)
-
-    plt.scatter(
-        xx_interchange,
-        yy_interchange,
-        c="white",
-        edgecolors="black",
-        marker="s",
-        s=MARKER_SIZE
-    )
 
-    for subcat, marker_style in subcat_marker_map.items():
 
-        xx_subcat: list[float] = [
-            node.evolution for node in node_list if node.subcat == subcat
-        ]
-        yy_subcat: list[float] = [
-            node.visibility for node in node_list if node.subcat == subcat
-        ]
-        for node in node_list:
-            if node.subcat == subcat:
-                remaining.remove(node)
+def plot_annotate_nodes(nodes: NodeTable, ax, subcat_marker_map: Dict[str, str]):
+    # Sort out axis points
 
-        plt.scatter(
-            xx_subcat,
-            yy_subcat,
+    for xx, yy, marker_style in group_node_markers(nodes, subcat_marker_map):
+        ax.scatter(
+            xx,
+            yy,
             **marker_style,
             s=MARKER_SIZE
         )
 
-    xx_remain: list[float] = [node.evolution for node in remaining]
-    yy_remain: list[float] = [node.visibility for node in remaining]
-    plt.scatter(
-        xx_remain,
-        yy_remain,
-        c="white",
-        edgecolors="black",
-        s=MARKER_SIZE
-    )
-
-    xx: list[float] = [node.evolution for node in node_list]
-    yy: list[float] = [node.visibility for node in node_list]
-    text = [node.title for node in node_list]
     annotations = []
 
-    for x_i, y_i, t_i in zip(xx, yy, text):
+    for x_i, y_i, t_i in zip(nodes.evolution, nodes.visibility, nodes.titles):
         ann = ax.annotate(
             t_i, (x_i, y_i - 0.01), size=14, ha="left", va="bottom")
         annotations.append(
@@ -193,99 +208,229 @@ class HandlerWplArrow(HandlerNpoints):
         return [legline, legline]
 
 
-def plot_arrow(node_list: NodesType, ax) -> List[Arrow]:
+def plot_arrow(nodes: NodeTable, ax) -> List[Artist]:
+    """
+    Draws the evolution arrows, a LineCollection and a Line2D of arrow heads
+    for each arrow type, however many arrows there are
+
+    Looks the same as an InertiaArrow per arrow, which the legend still uses
+    """
+    visibility = nodes.visibility[nodes.arrow_node]
+
+    lines_by_type: List[LineCollection] = []
+    heads_by_type: List[Line2D] = []
+    for type_idx, arrow_type in enumerate(nodes.arrow_types):
+        arrow_style = ARROW_STYLES[arrow_type]
+        of_type = nodes.arrow_type_idx == type_idx
+        if not of_type.any():
+            continue
+        start = np.column_stack([nodes.arrow_evolution_start[of_type], visibility[of_type]])
+        end = np.column_stack([nodes.arrow_evolution[of_type], visibility[of_type]])
+
+        lines = LineCollection(
+            np.stack([start, end], axis=1),
+            colors=arrow_style.color,
+            linestyles=arrow_style.linestyle,
+            label=arrow_style.label,
+            # same as the InertiaArrow lines, collections default lower
+            zorder=Line2D.zorder
+        )
+        # InertiaArrow's marker is only on the end of the line
+        heads = Line2D(
+            end[:, 0], end[:, 1],
+            color=arrow_style.color,
+            linestyle="none",
+            marker=">"
+        )
+        lines_by_type.append(lines)
+        heads_by_type.append(heads)
+
+    # heads on top, where one arrow carries on from another the join shows
+    for lines in lines_by_type:
+        ax.add_collection(lines)
+    for heads in heads_by_type:
+        ax.add_line(heads)
+    return [*lines_by_type, *heads_by_type]
 
-    for node in node_list:
-        for an_arrow in node.arrows:
-            line = InertiaArrow.from_arrow(
-                an_arrow, node.visibility)
-            ax.add_line(line)
 
+def build_connecting_lines(nodes: NodeTable) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The (n_edges, 2, 2) segments of every dependency, [[x_node, y_node],
+    [x_child, y_child]], and whether each is optional
 
-def build_connecting_lines(
-    node_graph: NodesType
-) -> Tuple[List[Tuple[float]], List[Tuple[float]], List[bool]]:
-    xxx_dep = [
-        (node.evolution, child.evolution)
-        for node in node_graph for child in node.children
-    ]
-    yyy_dep = [
-        (node.visibility, child.visibility)
-        for node in node_graph for child in node.children
-    ]
-    optional = [
-        (node.optional or child.optional) for node in node_graph for child in node.children
-    ]
-    return xxx_dep, yyy_dep, optional
+    One gather from the node positions, the edges themselves are cached on
+    the table
+    """
+    positions = np.column_stack([nodes.evolution, nodes.visibility])
+    return positions[nodes.edge_rows], nodes.edge_optional
 
 
 def plot_connecting_lines(
-        xxx_dep: List[Tuple[float]],
-        yyy_dep: List[Tuple[float]],
-        optional: List[bool]
-) -> None:
-
-    for (x_node, x_child), (y_node, y_child), opt in zip(xxx_dep, yyy_dep, optional):
-        plt.plot(
-            [x_node, x_child],
-            [y_node, y_child],
-            c="lightgrey" if opt else "darkgrey",
-            ls="-." if opt else "--",
+        segments: np.ndarray,
+        optional: np.ndarray,
+        ax
+) -> List[LineCollection]:
+    """
+    Draws the dependency lines as one collection per line style, rather than
+    one artist per edge
+    """
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+    optional = np.asarray(optional, dtype=bool).reshape(-1)
+
+    collections = []
+    for opt in (False, True):
+        opt_segments = segments[optional == opt]
+        if not len(opt_segments):
+            continue
+        lines = LineCollection(
+            opt_segments,
+            colors="lightgrey" if opt else "darkgrey",
+            linestyles="-." if opt else "--",
             zorder=-1
         )
+        ax.add_collection(lines)
+        collections.append(lines)
+    return collections
+
+
+def sample_edge_points(segments: np.ndarray, spacing: float = 0.01) -> np.ndarray:
+    """
+    Evenly spaced (n_points, 2) points along every dependency line, about
+    spacing apart (in data units), for all the edges at once
+
+    Every edge gets at least one point, its start, so vertical and zero length
+    edges are still obstacles
+    """
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+    start = segments[:, 0]
+    delta = segments[:, 1] - start
+
+    n_points = np.maximum(
+        np.ceil(np.hypot(delta[:, 0], delta[:, 1])/spacing).astype(np.intp), 1)
+    edge = np.repeat(np.arange(len(n_points)), n_points)
+    # fraction of the way along its edge of each point, in [0, 1)
+    first_point = np.cumsum(n_points) - n_points
+    along = (np.arange(len(edge)) - first_point[edge])/n_points[edge]
+
+    return start[edge] + along[:, np.newaxis]*delta[edge]
 
 
 def move_annotations_away(
-    xxx_dep: List[Tuple[float]],
-    yyy_dep: List[Tuple[float]],
-    annotations
+    segments: np.ndarray, annotations, engine: str = DEFAULT_LABEL_ENGINE
 ) -> None:
+    """
+    Shifts the annotations off each other, the nodes and the dependency lines
+
+    engine is one of LABEL_ENGINES. "grid", the default, is place_labels,
+    which clears every overlap on complex.json in a tenth of a second
+    (adjustText leaves a few, in a couple of seconds) and gets through maps of
+    thousands of nodes, where adjustText runs out of memory. Its label sizes
+    come from text_metrics' cache rather than a layout per label. It will move
+    a label further from its node to find it somewhere clear, adjustText keeps
+    them closer
+    """
+    if not annotations:
+        return
+    if engine not in LABEL_ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(LABEL_ENGINES)}, not {engine!r}")
+    ax = annotations[0].axes
 
     # make the annotations not cross the lines
     # get lots of dots along the lines plotted above
-    xx_routes = []
-    yy_routes = []
-    for xx_tmp, yy_tmp in zip(xxx_dep, yyy_dep):
-        f = interpolate.interp1d(xx_tmp, yy_tmp, fill_value="extrapolate")
-        xx_routes.append(
-            np.arange(min(xx_tmp), max(xx_tmp), 0.01)
+    edge_points = sample_edge_points(segments)
+
+    if engine == "adjustText":
+        # adjustText imports pyplot, so only pay for it when labels are moved
+        from adjustText import adjust_text
+
+        # shift the annotations away from those points. On its own it works
+        # in pyplot's current axes, which aren't these
+        adjust_text(
+            annotations,
+            x=edge_points[:, 0],
+            y=edge_points[:, 1],
+            ax=ax,
+            expand_points=(1.1, 1.2)
         )
-        yy_routes.append(
-            f(xx_routes[-1])
-        )
-    xx_pts = np.concatenate(xx_routes)
-    yy_pts = np.concatenate(yy_routes)
-
-    # shift the annotations away from those points
-    adjust_text(
-        annotations,
-        x=xx_pts,
-        y=yy_pts,
-        expand_points=(1.1, 1.2)
-    )
-
+        return
 
-def rescale_nodes(nodes: NodesType) -> None:
+    # and the nodes themselves
+    points = ax.transData.transform(np.concatenate([
+        edge_points,
+        [ann.xy for ann in annotations]
+    ]))
+    # the text is placed in data coordinates (ax.annotate's default)
+    text_positions = ax.transData.transform([ann.xyann for ann in annotations])
+    # sizes come from the process wide cache, not a layout per annotation
+    boxes = text_boxes(annotations, text_positions, ax.figure.dpi)
+
+    # shift the annotations away from those points, in display units
+    offsets, _ = place_labels(boxes, points, bounds=ax.bbox.extents)
+
+    new_positions = ax.transData.inverted().transform(text_positions + offsets)
+    for ann, position in zip(annotations, new_positions):
+        ann.xyann = tuple(position)
+
+
+def normalise_visibility(
+    visibility: np.ndarray,
+    scaling: str = "min-max",
+    value_range: Optional[Tuple[float, float]] = None
+) -> np.ndarray:
     """
-    Rescale visibility
-    """
-    if len(nodes) == 1:
-        nodes[0].visibility = nodes[0].visibility
-        return
+    Maps raw visibilities (smallest is the top of the value chain) to 1 at the
+    top down to 0 at the bottom
 
-    vis_min = min([n.visibility for n in nodes])
-    vis_max = max([n.visibility for n in nodes])
-    scale_factor = vis_max - vis_min
-    for node in nodes:
-        node.visibility = (
-            scale_factor - (node.visibility - vis_min))/scale_factor
+    min-max: the most and least visible at 1 and 0, linear in between
+    rank: each distinct visibility evenly spaced, keeping only the order
+    fixed: value_range (top, bottom) at 1 and 0 for every map, so maps drawn
+        with the same range line up, anything outside it is clipped
 
+    If there's nothing to spread out (one node, or all at the same
+    visibility) everything goes to the top
+    """
+    if scaling not in VISIBILITY_SCALINGS:
+        raise ValueError(
+            f"Unknown visibility scaling {scaling!r}, expected one of {VISIBILITY_SCALINGS}")
+    if scaling == "fixed" and value_range is None:
+        raise ValueError("fixed visibility scaling needs a value_range")
+    if not len(visibility):
+        return np.zeros(0)
+
+    if scaling == "rank":
+        # duplicates (e.g. interchanges and their nodes) share a rank
+        levels = np.unique(visibility)
+        depth = np.searchsorted(levels, visibility)
+        scale_factor = len(levels) - 1
+    else:
+        vis_min, vis_max = value_range if scaling == "fixed" else \
+            (visibility.min(), visibility.max())
+        depth = visibility - vis_min
+        scale_factor = vis_max - vis_min
+
+    if scale_factor == 0:
+        return np.ones(len(visibility))
+    return np.clip((scale_factor - depth)/scale_factor, 0, 1)
+
+
+def rescale_nodes(
+    nodes: NodeTable,
+    scaling: str = "min-max",
+    value_range: Optional[Tuple[float, float]] = None
+) -> None:
+    """
+    Rescale visibility, in place, see normalise_visibility for the scalings
+    """
     # shift visibility
-    for node in nodes:
-        node.visibility += VISIBILITY_BOOST
+    nodes.visibility[:] = normalise_visibility(
+        nodes.visibility, scaling, value_range) + VISIBILITY_BOOST
 
 
-def plot_interchanges(fig, ax, interchange: Interchange):
+def marker_data_size(ax) -> Tuple[float, float]:
+    """
+    The (width, height) of a MARKER_SIZE scatter marker in data units, for
+    the axes as they are now
+    """
 
     # this is the definition of points in mpl, I can use x & y lims
     # data values to convert this to data points and then draw the rectangle
@@ -294,61 +439,331 @@ def plot_interchanges(fig, ax, interchange: Interchange):
     # https://stackoverflow.com/questions/14827650/pyplot-scatter-plot-marker-size/47403507#47403507
 
     win_ext = ax.get_window_extent()
+    x_0, x_1 = ax.get_xlim()
     y_0, y_1 = ax.get_ylim()
-    data_height = (y_1 - y_0) * math.sqrt(MARKER_SIZE)/(win_ext.height)
-    data_height_shift = data_height
+    return (
+        (x_1 - x_0) * math.sqrt(MARKER_SIZE)/(win_ext.width),
+        (y_1 - y_0) * math.sqrt(MARKER_SIZE)/(win_ext.height)
+    )
 
-    x_0, x_1 = ax.get_xlim()
-    data_width = (x_1 - x_0) * math.sqrt(MARKER_SIZE)/(win_ext.width)
-    data_width_shift = data_width
-    print("data_width", data_width)
-    print(interchange.evolution_min)
-    print(interchange.evolution_max)
-    rect = patches.Rectangle(
-        (
-            interchange.evolution_min - data_width/2 - data_width_shift/2,
-            interchange.visibility - data_height/2 - data_height_shift/2
-        ),
-        interchange.evolution_max - interchange.evolution_min +
-        data_width + data_width_shift,
-        data_height + data_height_shift,
-        fill=False,
+
+def plot_interchanges(ax, nodes: NodeTable) -> Optional[PatchCollection]:
+    """
+    Draws a box around each interchange's nodes, one collection for them all,
+    and moves each interchange's visibility to the top middle of its box
+    """
+    rows = np.flatnonzero(nodes.interchange_mask)
+    if not len(rows):
+        return None
+
+    data_width, data_height = marker_data_size(ax)
+    # the box is a marker bigger than the nodes all round
+    lower_left = np.column_stack([
+        nodes.evolution_min[rows] - data_width,
+        nodes.visibility[rows] - data_height
+    ])
+    widths = nodes.evolution_max[rows] - nodes.evolution_min[rows] + 2*data_width
+
+    boxes = PatchCollection(
+        [
+            patches.Rectangle(xy, width, 2*data_height, fill=False)
+            for xy, width in zip(lower_left, widths)
+        ],
+        match_original=True,
         zorder=-1
     )
-    ax.add_patch(rect)
-    return interchange.visibility + (data_height + data_height_shift)/2
+    ax.add_collection(boxes, autolim=False)
+    nodes.visibility[rows] += data_height
+    return boxes
+
+
+def new_figure(figsize: Sequence[float] = FIGSIZE) -> Figure:
+    """
+    A Figure on an Agg canvas, made without going anywhere near pyplot
+    """
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+class MapCanvas:
+    """
+    A figure with setup_plot's axes furniture already drawn, to draw map
+    after map onto. clear takes off everything except the furniture, so the
+    axis labels, ticks, stage lines and spines are only made once
 
+    style is a matplotlib style, the maps have to be drawn and saved inside
+    style_context too for them to match the furniture
+    """
 
-def draw_wardley_map_from_json(data_path: Path, subcat_marker_map: Dict[str, str]):
-    with data_path.open("r") as data_fh:
-        data_data = json.load(data_fh)
+    def __init__(
+        self,
+        max_evolution: int = 4,
+        figsize: Sequence[float] = FIGSIZE,
+        style: Optional[str] = None
+    ) -> None:
+        self.style = style
+        with self.style_context():
+            self.figure = new_figure(figsize)
+            self.ax = self.figure.add_subplot()
+            setup_plot(self.ax, max_evolution)
+        self._furniture = set(self._artists())
+
+    def _artists(self) -> List[Artist]:
+        ax = self.ax
+        return [
+            *ax.collections, *ax.lines, *ax.patches, *ax.texts,
+            *ax.images, *ax.artists, *ax.tables
+        ]
 
-    nodes: list[Node] = nodes_from_node_data(data_data["nodes"])
+    @contextmanager
+    def style_context(self) -> Iterator[None]:
+        global _styled_canvases, _unlocked_renders
+
+        if self.style is None:
+            # unstyled maps draw side by side until a styled one could swap
+            # the rcParams under them, then they take turns with it
+            with _style_state:
+                locked = _styled_canvases
+                if not locked:
+                    _unlocked_renders += 1
+            if locked:
+                with _style_lock:
+                    yield
+                return
+            try:
+                yield
+            finally:
+                with _style_state:
+                    _unlocked_renders -= 1
+                    _style_state.notify_all()
+            return
+
+        from matplotlib import style
+        # styles change the global rcParams, so one styled map at a time, and
+        # not while an unstyled map that started before any styled one is
+        # still drawing
+        with _style_lock:
+            with _style_state:
+                _styled_canvases = True
+                _style_state.wait_for(lambda: not _unlocked_renders)
+            with style.context(self.style):
+                yield
+
+    def clear(self) -> None:
+        for artist in self._artists():
+            if artist not in self._furniture:
+                artist.remove()
+        if self.ax.legend_ is not None:
+            self.ax.legend_.remove()
+        self.ax.set_title("")
+
+
+_style_lock = threading.RLock()
+# whether any canvas has had a style, and the unstyled renders drawing without
+# _style_lock from before one did
+_style_state = threading.Condition()
+_styled_canvases = False
+_unlocked_renders = 0
+
+
+def release_figure(fig: Figure) -> None:
+    """
+    Frees fig and everything on it now. Figures are full of reference cycles
+    (figure, canvas, axes, artists), left to the garbage collector a batch of
+    maps climbs well over the memory one map needs before they're collected
+    """
+    fig.clear()
+    gc.collect()
+
+
+class FigurePool:
+    """
+    Up to max_size MapCanvases, lent out for one render at a time and cleared
+    when they come back, so a long batch draws on a few figures rather than
+    making one per map
+
+    Safe to share between threads, each borrower gets its own canvas. Any
+    more canvases than max_size needed at once are released after use
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1,
+        max_evolution: int = 4,
+        figsize: Sequence[float] = FIGSIZE,
+        style: Optional[str] = None
+    ) -> None:
+        self.max_size = max_size
+        self._canvas_args = (max_evolution, tuple(figsize), style)
+        self._free: List[MapCanvas] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> MapCanvas:
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        return MapCanvas(*self._canvas_args)
+
+    def release(self, canvas: MapCanvas) -> None:
+        canvas.clear()
+        with self._lock:
+            if len(self._free) < self.max_size:
+                self._free.append(canvas)
+                return
+        release_figure(canvas.figure)
+
+
+@contextmanager
+def render_context(pool: Optional[FigurePool] = None) -> Iterator[MapCanvas]:
+    """
+    A canvas that's only good for the with block: borrowed from pool and
+    handed back, or without a pool made for this render and released after,
+    even if drawing fails
+    """
+    canvas = pool.acquire() if pool is not None else MapCanvas()
+    try:
+        yield canvas
+    finally:
+        if pool is not None:
+            pool.release(canvas)
+        else:
+            release_figure(canvas.figure)
+
+
+def draw_wardley_map(
+    map_data: Dict[str, Any],
+    nodes: NodeTable,
+    subcat_marker_map: Dict[str, str],
+    fig: Optional[Figure] = None,
+    move_labels: bool = False,
+    canvas: Optional[MapCanvas] = None,
+    label_engine: str = DEFAULT_LABEL_ENGINE
+):
+    """
+    Draws a loaded map (the top level entries, e.g. "title", and its nodes)
+    onto fig, a new headless Figure (see new_figure) if not given, or onto
+    canvas (cleared first) to reuse its furniture
+
+    The nodes are rescaled on a copy of their positions, returned with the
+    axes, nodes itself is left as it was. move_labels shifts the labels off
+    each other and the dependency lines, with label_engine (one of
+    LABEL_ENGINES, see move_annotations_away)
+    """
+    nodes = nodes.with_own_positions()
     rescale_nodes(nodes)
-    interchanges: list[Interchange] = [
-        Interchange.from_dict(interchange_row, nodes) for interchange_row in data_data["interchanges"]
-    ]
-    nodes: NodesType = nodes + interchanges
-    build_node_graph(nodes)
 
-    fig = plt.figure(figsize=[12.8, 9.6])
-    ax = fig.add_subplot()
+    if canvas is not None:
+        canvas.clear()
+        ax = canvas.ax
+    else:
+        if fig is None:
+            fig = new_figure()
+        ax = fig.add_subplot()
 
-    setup_plot(ax)  # , 2)
+        setup_plot(ax)  # , 2)
 
-    plt.title(data_data["title"], weight="bold", fontsize=14)
+    ax.set_title(map_data["title"], weight="bold", fontsize=14)
 
-    for interchange in interchanges:
-        # the location for visibility is top middle of the interchange box
-        interchange.visibility = plot_interchanges(fig, ax, interchange)
+    plot_interchanges(ax, nodes)
     annotations = plot_annotate_nodes(nodes, ax, subcat_marker_map)
     plot_arrow(nodes, ax)
-    xxx_dep, yyy_dep, optional = build_connecting_lines(nodes)
-    plot_connecting_lines(xxx_dep, yyy_dep, optional)
-    # move_annotations_away(xxx_dep, yyy_dep, annotations)
+    segments, optional = build_connecting_lines(nodes)
+    plot_connecting_lines(segments, optional, ax)
+    if move_labels:
+        move_annotations_away(segments, annotations, label_engine)
     return ax, nodes
 
 
+def draw_wardley_map_from_json(
+    data_path: Path,
+    subcat_marker_map: Dict[str, str],
+    fig: Optional[Figure] = None,
+    move_labels: bool = False,
+    canvas: Optional[MapCanvas] = None,
+    label_engine: str = DEFAULT_LABEL_ENGINE
+):
+    """
+    Loads the map at data_path (JSON, or a .wmap binary map) and draws it,
+    see draw_wardley_map
+    """
+    map_data, nodes = load_map_table(data_path)
+    return draw_wardley_map(
+        map_data, nodes, subcat_marker_map, fig, move_labels, canvas, label_engine)
+
+
+def plot_legend(ax, nodes: NodeTable) -> None:
+    # already unique, in the order they're first used, a set's order changes
+    # from process to process with the string hash seed
+    arrow_types = nodes.arrow_types
+
+    lengend_arrows = [
+        *[InertiaArrow.from_arrow(Arrow(0, 0, arr_type), 0)
+          for arr_type in arrow_types],
+        #     Line2D([], [], label="Necessary link for reactor",
+        #            color="darkgrey", ls="--"),
+        #     Line2D([], [], label="Less necessary link", color="lightgrey", ls="-.")
+        # ] + [
+        #     Line2D([], [], label=subcat, **marker_style, ls="")
+        #     for subcat, marker_style in subcat_marker_map.items()
+    ]
+
+    ax.legend(
+        handles=lengend_arrows,
+        handler_map={
+            InertiaArrow: HandlerWplArrow()
+        },
+        prop={"size": 12}
+    )
+
+
+def render_wardley_map(
+    data_path: Path,
+    subcat_marker_map: Dict[str, str],
+    image_formats: Sequence[str],
+    move_labels: bool = False,
+    canvas: Optional[MapCanvas] = None,
+    label_engine: str = DEFAULT_LABEL_ENGINE
+) -> Dict[str, bytes]:
+    """
+    Draws the map, with legend, once and returns the image in each format
+
+    Headless, this never imports pyplot. Pass a canvas (e.g. from a
+    render_context with a FigurePool) when rendering lots of maps, to skip
+    setting up the axes each time. Without one the map's figure is released
+    before returning
+    """
+    map_data, nodes = load_map_table(data_path)
+    return render_node_table(
+        map_data, nodes, subcat_marker_map, image_formats, move_labels, canvas, label_engine)
+
+
+def render_node_table(
+    map_data: Dict[str, Any],
+    nodes: NodeTable,
+    subcat_marker_map: Dict[str, str],
+    image_formats: Sequence[str],
+    move_labels: bool = False,
+    canvas: Optional[MapCanvas] = None,
+    label_engine: str = DEFAULT_LABEL_ENGINE
+) -> Dict[str, bytes]:
+    """
+    render_wardley_map for a map that's already loaded
+    """
+    if canvas is None:
+        with render_context() as canvas:
+            return render_node_table(
+                map_data, nodes, subcat_marker_map, image_formats, move_labels, canvas,
+                label_engine)
+
+    with canvas.style_context():
+        ax, nodes = draw_wardley_map(
+            map_data, nodes, subcat_marker_map, move_labels=move_labels, canvas=canvas,
+            label_engine=label_engine)
+        plot_legend(ax, nodes)
+        return figure_images(ax.figure, image_formats)
+
+
 # def draw_data_from_json(data_path: Path):
 #     with data_path.open("r") as data_fh:
 #         data_data = json.load(data_fh)
@@ -380,52 +795,47 @@ def draw_wardley_map_from_json(data_path: Path, subcat_marker_map: Dict[str, str
 
 
 if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--show", action="store_true", help="open the map in a window")
+    parser.add_argument(
+        "-o", "--output", dest="outputs", action="append", default=[],
+        help="where to write the image, - for stdout, can be repeated. Defaults "
+        "to <map>_tmp.svg next to the map, and <map>.svg in $IMAGE_DIR if set")
+    parser.add_argument(
+        "--format", dest="image_format", default="svg",
+        help="image format for stdout and paths without a suffix")
+    args = parser.parse_args()
+
+    fig = None
+    if args.show:
+        # pyplot (and a GUI backend) only when there's a window to show
+        from matplotlib import pyplot as plt
+        fig = plt.figure(figsize=FIGSIZE)
 
     data_dir = Path("fusion")
     data_path = data_dir / "very-simplified.json"
     # draw_data_from_json(data_path)
-    subcat_marker_map: Dict[str, str] = {
-        # , "edgecolors": "firebrick"},
-        "Laser": {"marker": "^", "c": "C2"},
-        "Targets": {"marker": "X", "c": "C3"},
-        "Struct": {"marker": "D", "c": "C4"},
-        "Plasma Physics": {"marker": "s", "c": "C5"}
-    }
-
-    ax, node_graph = draw_wardley_map_from_json(data_path, subcat_marker_map)
 
-    image_dir = data_dir
-    image_path = image_dir / (data_path.stem+"_tmp.svg")
-    print(data_path)
+    ax, node_graph = draw_wardley_map_from_json(data_path, SUBCAT_MARKER_MAP, fig)
+    print(data_path, file=sys.stderr)
 
-    arrow_types = set(
-        arrow.type for node in node_graph for arrow in node.arrows)
+    plot_legend(ax, node_graph)
 
-    lengend_arrows = [
-        *[InertiaArrow.from_arrow(Arrow(0, 0, arr_type), 0)
-          for arr_type in arrow_types],
-        #     Line2D([], [], label="Necessary link for reactor",
-        #            color="darkgrey", ls="--"),
-        #     Line2D([], [], label="Less necessary link", color="lightgrey", ls="-.")
-        # ] + [
-        #     Line2D([], [], label=subcat, **marker_style, ls="")
-        #     for subcat, marker_style in subcat_marker_map.items()
+    sinks = [
+        sys.stdout.buffer if output == "-" else Path(output) for output in args.outputs
     ]
-
-    ax.legend(
-        handles=lengend_arrows,
-        handler_map={
-            InertiaArrow: HandlerWplArrow()
-        },
-        prop={"size": 12}
-    )
-
-    print(image_path)
-    plt.savefig(image_path)
-    if image_dir := os.environ.get("IMAGE_DIR"):
-        image_path = Path(image_dir) / (data_path.stem+".svg")
-
-        print(image_path)
-        plt.savefig(image_path)
-
-    plt.show()
+    if not sinks:
+        image_dir = data_dir
+        sinks.append(image_dir / (data_path.stem+"_tmp.svg"))
+        if image_dir := os.environ.get("IMAGE_DIR"):
+            sinks.append(Path(image_dir) / (data_path.stem+".svg"))
+
+    for sink in sinks:
+        if isinstance(sink, Path):
+            print(sink, file=sys.stderr)
+    # each format is only rendered once, however many places it goes
+    export_figure(
+        ax.figure, [(image_format_of(sink, args.image_format), sink) for sink in sinks])
+
+    if args.show:
+        plt.show()
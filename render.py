@@ -0,0 +1,354 @@
+"""
+Renders every map in a directory, a process per map
+
+    python render.py fusion --format svg png --workers 8
+
+or with --threads, on a pool of threads in this one process. Drawing is
+mostly Python so threads don't draw any faster than one process, but they
+share the text size cache and don't start new interpreters.
+
+Images go to IMAGE_DIR if it's set, otherwise next to the JSON. Maps whose
+JSON and styles haven't changed since the last run come from the render cache
+and their images are only rewritten if they differ.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from hashlib import sha512
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence
+import json
+import os
+import sys
+import threading
+
+from plot_map import (
+    __version__, ARROW_STYLES, DEFAULT_LABEL_ENGINE, LABEL_ENGINES, SUBCAT_MARKER_MAP,
+    FigurePool, render_context, render_node_table, render_wardley_map
+)
+from wardley_mappoltlib.export import write_atomic
+from wardley_mappoltlib.render_cache import RenderCache, render_key
+from wardley_mappoltlib.shared_table import SharedNodeTable, attached_node_table
+
+
+IMAGE_FORMATS = ["svg", "png", "pdf"]
+CACHE_DIR = Path(__file__).parent / ".render_cache"
+HASH_CHUNK_SIZE = 1 << 16
+PROC_STATUS = Path("/proc/self/status")
+CLEAR_REFS = Path("/proc/self/clear_refs")
+
+# one pool per process, shared by its threads, made on first use
+_figure_pools: Dict[int, FigurePool] = {}
+_figure_pools_lock = threading.Lock()
+
+# drawn by warm_up, small but with a bit of everything
+WARM_UP_MAP = {
+    "title": "Warm up",
+    "nodes": [
+        {"code": "A", "title": "A", "type": "Node", "visibility": 0,
+         "evolution": 0.5, "dependencies": ["B"],
+         "arrows": [{"evolution": 1, "type": "inertia"}]},
+        {"code": "B", "title": "B", "type": "Node", "visibility": 1,
+         "evolution": 2.5, "subcat": "Laser"}
+    ],
+    "interchanges": []
+}
+
+
+@dataclass
+class RenderResult:
+    data_path: Path
+    seconds: float
+    cached: bool = False
+    error: Optional[str] = None
+    # the most memory used while drawing this map, where that can be measured
+    peak_rss_mb: Optional[float] = None
+    # otherwise the most the rendering process had used so far, over every
+    # map it had drawn
+    worker_peak_rss_mb: Optional[float] = None
+
+
+def reset_peak_rss() -> bool:
+    """
+    Starts peak_rss_mb again from the memory in use now, False where that
+    can't be done (anywhere but Linux)
+    """
+    try:
+        # 5 resets the peak RSS, see proc(5)
+        CLEAR_REFS.write_text("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident memory of this process since it started, or since
+    reset_peak_rss. None where the platform doesn't say (Windows)
+    """
+    try:
+        with PROC_STATUS.open() as status_fh:
+            for line in status_fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])/1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kB everywhere else
+    return peak/(1024*1024 if sys.platform == "darwin" else 1024)
+
+
+def figure_pool(size: int) -> Optional[FigurePool]:
+    """
+    This process's pool of figures, None for size 0 (a new figure per map)
+    """
+    if not size:
+        return None
+    with _figure_pools_lock:
+        if (pool := _figure_pools.get(size)) is None:
+            pool = _figure_pools[size] = FigurePool(size)
+    return pool
+
+
+def warm_up(image_formats: Sequence[str] = ("svg", "png")) -> None:
+    """
+    Draws a small map in each format on this process's figure pool, so fonts,
+    the text size cache and the figure are ready before the first real map.
+    For worker processes that stick around, as an executor initializer
+    """
+    with NamedTemporaryFile("w", suffix=".json") as data_fh:
+        json.dump(WARM_UP_MAP, data_fh)
+        data_fh.flush()
+        with render_context(figure_pool(1)) as canvas:
+            render_wardley_map(
+                Path(data_fh.name), SUBCAT_MARKER_MAP, image_formats, canvas=canvas)
+
+
+def render_shared_map(
+    map_data: Dict[str, Any],
+    shared: SharedNodeTable,
+    image_formats: Sequence[str],
+    figure_pool_size: int = 1,
+    label_engine: Optional[str] = None
+) -> Dict[str, bytes]:
+    """
+    Renders a map loaded into shared memory (see shared_node_table), so
+    workers drawing the same map don't each load it or get sent a copy.
+    map_data is the map's other top level entries, e.g. "title", label_engine
+    as for render_map
+    """
+    with attached_node_table(shared) as nodes, \
+            render_context(figure_pool(figure_pool_size)) as canvas:
+        return render_node_table(
+            map_data, nodes, SUBCAT_MARKER_MAP, image_formats,
+            canvas=canvas, **_label_args(label_engine))
+
+
+def _label_args(label_engine: Optional[str]) -> Dict[str, Any]:
+    if label_engine is None:
+        return {}
+    return {"move_labels": True, "label_engine": label_engine}
+
+
+def map_digest(map_json: bytes) -> str:
+    return sha512(map_json).hexdigest()
+
+
+def map_file_digest(data_path: Path) -> str:
+    """
+    map_digest of the file at data_path, read a chunk at a time rather than
+    loaded (or parsed) whole
+    """
+    hasher = sha512()
+    with data_path.open("rb") as data_fh:
+        while chunk := data_fh.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def map_render_key(
+    map_digest: str, image_format: str, label_engine: Optional[str] = None
+) -> str:
+    """
+    Changes whenever anything that goes into the image changes, map_digest
+    being the map file's (see map_file_digest)
+    """
+    return render_key(
+        map_digest,
+        SUBCAT_MARKER_MAP,
+        {arrow_type: asdict(style) for arrow_type, style in ARROW_STYLES.items()},
+        image_format,
+        label_engine,
+        __version__
+    )
+
+
+def _write_if_changed(image_path: Path, image: bytes) -> None:
+    if image_path.exists() and image_path.read_bytes() == image:
+        return
+    write_atomic(image_path, image)
+
+
+def render_map(
+    data_path: Path,
+    image_dir: Path,
+    image_formats: Sequence[str],
+    cache: Optional[RenderCache] = None,
+    figure_pool_size: int = 1,
+    own_process: bool = True,
+    label_engine: Optional[str] = None
+) -> RenderResult:
+    """
+    Renders one map to image_dir, once per format, skipping the drawing if
+    every format is in the cache
+
+    The map is drawn on a canvas from this process's figure pool, or with
+    figure_pool_size 0 on a new figure that's released straight after.
+    own_process false for maps drawn side by side in one process (threads),
+    whose peaks can't be told apart, the result has the process's peak instead.
+    label_engine (one of LABEL_ENGINES) moves the labels off each other and the
+    lines, None leaves them where they're put
+    """
+    start = perf_counter()
+    result = RenderResult(data_path, 0.0)
+    per_render_peak = own_process and reset_peak_rss()
+    try:
+        images: Dict[str, bytes] = {}
+        keys: Dict[str, str] = {}
+        if cache is not None:
+            # the raw bytes, parsing the map just for its key would cost as
+            # much as loading it to draw
+            digest = map_file_digest(data_path)
+            for image_format in image_formats:
+                keys[image_format] = map_render_key(digest, image_format, label_engine)
+                if (image := cache.get(keys[image_format])) is not None:
+                    images[image_format] = image
+
+        result.cached = len(images) == len(image_formats)
+        if not result.cached:
+            missing_formats = [
+                image_format for image_format in image_formats if image_format not in images
+            ]
+            with render_context(figure_pool(figure_pool_size)) as canvas:
+                rendered = render_wardley_map(
+                    data_path, SUBCAT_MARKER_MAP, missing_formats, canvas=canvas,
+                    **_label_args(label_engine))
+            for image_format, image in rendered.items():
+                if cache is not None:
+                    cache.put(keys[image_format], image)
+            images.update(rendered)
+
+        for image_format, image in images.items():
+            _write_if_changed(image_dir / f"{data_path.stem}.{image_format}", image)
+    except Exception as exc:  # one bad map shouldn't stop the batch
+        result.error = f"{type(exc).__name__}: {exc}"
+    result.seconds = perf_counter() - start
+    if per_render_peak:
+        result.peak_rss_mb = peak_rss_mb()
+    else:
+        result.worker_peak_rss_mb = peak_rss_mb()
+    return result
+
+
+def render_directory(
+    data_dir: Path,
+    image_dir: Path,
+    image_formats: Sequence[str],
+    workers: Optional[int] = None,
+    cache: Optional[RenderCache] = None,
+    threads: bool = False,
+    figure_pool_size: int = 1,
+    label_engine: Optional[str] = None
+) -> List[RenderResult]:
+    """
+    Renders every *.json in data_dir, printing the time for each as it finishes
+
+    threads draws the maps on threads rather than processes, every stage only
+    touches its own figure so maps can be drawn side by side
+    """
+    data_paths = sorted(data_dir.glob("*.json"))
+    results: List[RenderResult] = []
+    pool = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with pool(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                render_map, data_path, image_dir, image_formats, cache, figure_pool_size,
+                not threads, label_engine)
+            for data_path in data_paths
+        ]
+        for future in as_completed(futures):
+            result: RenderResult = future.result()
+            status = f"FAILED {result.error}" if result.error else \
+                "cached" if result.cached else ""
+            rss = f"{result.peak_rss_mb:6.0f} MB" if result.peak_rss_mb is not None else \
+                f"{result.worker_peak_rss_mb:6.0f} MB worker" \
+                if result.worker_peak_rss_mb is not None else ""
+            print(f"{result.seconds:8.2f} s {rss}  {result.data_path}  {status}")
+            results.append(result)
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = ArgumentParser(description="Render every map in a directory")
+    parser.add_argument("data_dir", type=Path, help="directory of map *.json")
+    parser.add_argument(
+        "--image-dir", type=Path, default=os.environ.get("IMAGE_DIR"),
+        help="where to write images, defaults to $IMAGE_DIR then data_dir")
+    parser.add_argument(
+        "--format", dest="image_formats", nargs="+", choices=IMAGE_FORMATS,
+        default=["svg"])
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="worker processes (or threads), defaults to the number of CPUs")
+    parser.add_argument(
+        "--threads", action="store_true",
+        help="render on threads in this process rather than worker processes")
+    parser.add_argument(
+        "--cache-dir", type=Path, default=CACHE_DIR,
+        help="render cache location, defaults to .render_cache")
+    parser.add_argument(
+        "--cache-size", type=int, default=512,
+        help="render cache size limit in MB, least recently used go first")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--figure-pool", type=int, default=1,
+        help="figures each worker process keeps to draw on, 0 for a new one per "
+        "map, with --threads at least --workers to keep every thread's")
+    parser.add_argument(
+        "--move-labels", dest="label_engine", nargs="?", const=DEFAULT_LABEL_ENGINE,
+        choices=LABEL_ENGINES,
+        help=f"move labels off each other and the lines, with this engine "
+        f"(default {DEFAULT_LABEL_ENGINE})")
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else \
+        RenderCache(args.cache_dir, max_bytes=args.cache_size*1024*1024)
+
+    image_dir: Path = args.image_dir or args.data_dir
+    image_dir.mkdir(parents=True, exist_ok=True)
+
+    start = perf_counter()
+    results = render_directory(
+        args.data_dir, image_dir, args.image_formats, args.workers, cache,
+        args.threads, args.figure_pool, args.label_engine)
+    failed = [result for result in results if result.error]
+    print(
+        f"Rendered {len(results) - len(failed)} of {len(results)} maps "
+        f"in {perf_counter() - start:.2f} s"
+    )
+    for name, field in [("map", "peak_rss_mb"), ("worker", "worker_peak_rss_mb")]:
+        peaks = [getattr(result, field) for result in results
+                 if getattr(result, field) is not None]
+        if peaks:
+            print(f"Peak RSS of any {name} {max(peaks):.0f} MB")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
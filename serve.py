@@ -0,0 +1,237 @@
+"""
+Renders maps over HTTP, for tools that want an image without paying for
+Python and matplotlib starting up every time
+
+    python serve.py --port 8765 --workers 2
+    curl --data-binary @fusion/very-simplified.json \
+        "http://127.0.0.1:8765/render?format=png" > map.png
+
+POST the map JSON (same as the files, "title", "nodes", "interchanges") to
+/render, format is svg (the default) or png. Maps are drawn in worker
+processes that have already imported everything and drawn a map, on a figure
+they keep. Every image has an ETag, a request with a matching If-None-Match
+gets a 304 without drawing anything, and images are kept in the same render
+cache as render.py. A map that needs drawing while every worker is busy gets a
+503 straight away rather than waiting in a queue.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+import json
+import os
+import sys
+import threading
+
+from plot_map import SUBCAT_MARKER_MAP, render_context, render_wardley_map
+from render import CACHE_DIR, figure_pool, map_digest, map_render_key, warm_up
+from wardley_mappoltlib.render_cache import RenderCache
+
+
+CONTENT_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+RENDER_TIMEOUT = 60
+
+
+def render_map_data(map_json: bytes, image_format: str) -> bytes:
+    """
+    Draws the map in map_json, in a worker process
+    """
+    # the map is drawn from a file, the same as everything else
+    with NamedTemporaryFile(suffix=".json") as data_fh:
+        data_fh.write(map_json)
+        data_fh.flush()
+        with render_context(figure_pool(1)) as canvas:
+            return render_wardley_map(
+                Path(data_fh.name), SUBCAT_MARKER_MAP, [image_format], canvas=canvas
+            )[image_format]
+
+
+def start_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    A pool of workers, every one of them started and warmed up
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+    # workers only start when there's work, so give them some
+    for future in [executor.submit(int) for _ in range(workers)]:
+        future.result()
+    return executor
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # weak comparison, as If-None-Match is meant to use
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+class RenderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        workers: int,
+        cache: Optional[RenderCache] = None
+    ) -> None:
+        super().__init__(address, RenderHandler)
+        self.workers = workers
+        self.cache = cache
+        self.executor = start_executor(workers)
+        self._executor_lock = threading.Lock()
+        # one per worker, held until the worker's done with the render
+        self.render_slots = threading.BoundedSemaphore(workers)
+
+    def replace_executor(self, broken: ProcessPoolExecutor) -> None:
+        """
+        A new pool for one that's broken (a worker died, e.g. out of memory),
+        unless another request has replaced it already
+        """
+        with self._executor_lock:
+            if self.executor is not broken:
+                return
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = start_executor(self.workers)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    server: RenderServer
+
+    def do_GET(self) -> None:
+        if urlparse(self.path).path == "/health":
+            self._send(HTTPStatus.OK, b"ok\n", "text/plain")
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "POST maps to /render")
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/render":
+            self._send_error(HTTPStatus.NOT_FOUND, "POST maps to /render")
+            return
+        image_format = parse_qs(url.query).get("format", ["svg"])[0]
+        if image_format not in CONTENT_TYPES:
+            self._send_error(
+                HTTPStatus.BAD_REQUEST, f"format must be one of {', '.join(CONTENT_TYPES)}")
+            return
+
+        map_json = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            json.loads(map_json)
+        except ValueError as exc:
+            self._send_error(HTTPStatus.BAD_REQUEST, f"Map isn't JSON: {exc}")
+            return
+
+        key = map_render_key(map_digest(map_json), image_format)
+        etag = f'"{key}"'
+        if _etag_matches(self.headers.get("If-None-Match"), etag):
+            self._send(HTTPStatus.NOT_MODIFIED, b"", etag=etag)
+            return
+
+        cache = self.server.cache
+        image = cache.get(key) if cache is not None else None
+        if image is None:
+            slots = self.server.render_slots
+            if not slots.acquire(blocking=False):
+                self._send_error(
+                    HTTPStatus.SERVICE_UNAVAILABLE, "Every render worker is busy, try again")
+                return
+            executor = self.server.executor
+            try:
+                future = executor.submit(render_map_data, map_json, image_format)
+            except RuntimeError as exc:
+                # broken, or shut down by replace_executor for another request
+                # since this one picked it up
+                slots.release()
+                if isinstance(exc, BrokenProcessPool):
+                    self.server.replace_executor(executor)
+                    message = "A render worker died, try again"
+                else:
+                    message = "The render workers restarted, try again"
+                self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, message)
+                return
+            # still held after a timeout, the worker's busy until it finishes
+            future.add_done_callback(lambda _: slots.release())
+            try:
+                image = future.result(RENDER_TIMEOUT)
+            except TimeoutError:
+                # only stops a render that hasn't started, one that has runs on
+                future.cancel()
+                self._send_error(
+                    HTTPStatus.GATEWAY_TIMEOUT, f"Not drawn within {RENDER_TIMEOUT} s")
+                return
+            except BrokenProcessPool:
+                self.server.replace_executor(executor)
+                self._send_error(
+                    HTTPStatus.SERVICE_UNAVAILABLE, "A render worker died, try again")
+                return
+            except Exception as exc:  # the map itself, e.g. an unknown arrow type
+                self._send_error(
+                    HTTPStatus.UNPROCESSABLE_ENTITY, f"{type(exc).__name__}: {exc}")
+                return
+            if cache is not None:
+                cache.put(key, image)
+        self._send(HTTPStatus.OK, image, CONTENT_TYPES[image_format], etag)
+
+    def _send(
+        self,
+        status: HTTPStatus,
+        body: bytes,
+        content_type: Optional[str] = None,
+        etag: Optional[str] = None
+    ) -> None:
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+            # always check back, the ETag makes that cheap
+            self.send_header("Cache-Control", "no-cache")
+        if content_type is not None:
+            self.send_header("Content-Type", content_type)
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str) -> None:
+        self._send(status, f"{message}\n".encode(), "text/plain")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = ArgumentParser(description="Render maps over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="worker processes, defaults to the number of CPUs")
+    parser.add_argument(
+        "--cache-dir", type=Path, default=CACHE_DIR,
+        help="render cache location, defaults to .render_cache")
+    parser.add_argument(
+        "--cache-size", type=int, default=512,
+        help="render cache size limit in MB, least recently used go first")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else \
+        RenderCache(args.cache_dir, max_bytes=args.cache_size*1024*1024)
+
+    workers = args.workers or os.cpu_count() or 1
+    with RenderServer((args.host, args.port), workers, cache) as server:
+        print(f"Serving on http://{args.host}:{server.server_port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -51,6 +51,26 @@ class Venv:
 
 
 @task
-def plot_map(c):
+def plot_map(c, show=False):
     with Venv.virtualenv(c):
-        c.run(f"python plot_map.py")
+        c.run("python plot_map.py" + (" --show" if show else ""))
+
+
+@task
+def render(c, data_dir, image_format="svg", workers=None, threads=False):
+    args = f"{data_dir} --format {image_format}"
+    if workers:
+        args += f" --workers {workers}"
+    if threads:
+        args += " --threads"
+    with Venv.virtualenv(c):
+        c.run(f"python render.py {args}")
+
+
+@task
+def serve(c, port=8765, workers=None):
+    args = f"--port {port}"
+    if workers:
+        args += f" --workers {workers}"
+    with Venv.virtualenv(c):
+        c.run(f"python serve.py {args}")
@@ -0,0 +1,332 @@
+"""
+A compact binary file for maps, quick to load because it's a NodeTable
+already laid out on disk
+
+    python -m wardley_mappoltlib.binary_map fusion/complex.json   # complex.wmap
+    python -m wardley_mappoltlib.binary_map fusion/complex.wmap   # complex.json
+
+The file is MAGIC, the header length, a JSON header (the map's other top
+level entries, the categories and where each array is) and then the arrays,
+each on a cache line. Loading maps the file copy-on-write and the NodeTable's
+columns are views of it, only the strings are decoded. Drawing moves nodes,
+those pages are copied, the file is never written.
+
+Converting back gives the same JSON data as went in: node keys the table
+doesn't hold (e.g. the old "arrow") are kept as JSON, and flags record which
+optional keys were there and which numbers were ints.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import json
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+from wardley_mappoltlib.export import write_atomic
+from wardley_mappoltlib.json_stream import load_node_table
+from wardley_mappoltlib.node_table import (
+    NO_SUBCAT, NodeTable, interchange_member_rows, node_table_from_node_data
+)
+from wardley_mappoltlib.nodes import InterchangeDataType, NodeDataType
+from wardley_mappoltlib.packed_arrays import (
+    ALIGN, array_layout, array_views, pack_strings, unpack_strings, write_arrays
+)
+from wardley_mappoltlib.shared_table import ARRAY_FIELDS, CATEGORY_FIELDS, STRING_FIELDS
+
+
+BINARY_SUFFIX = ".wmap"
+MAGIC = b"\x89WMAP\r\n\x1a"
+FORMAT_VERSION = 1
+_HEADER_LENGTH = struct.Struct("<Q")
+
+# node_flags, which optional keys a node (or interchange) had and how
+HAS_DEPENDENCIES = 1
+HAS_SUBCAT = 2
+HAS_OPTIONAL = 4
+HAS_ARROWS = 8
+EVOLUTION_INT = 16
+VISIBILITY_INT = 32
+# arrow_flags
+HAS_EVOLUTION_START = 1
+ARROW_EVOLUTION_INT = 2
+ARROW_EVOLUTION_START_INT = 4
+
+_NODE_KEYS = {"code", "title", "type", "dependencies", "visibility", "evolution",
+              "subcat", "optional", "arrows"}
+_INTERCHANGE_KEYS = {"code", "title", "interchanges", "dependencies"}
+_ARROW_KEYS = {"evolution", "type", "evolution_start"}
+
+
+def _number_flag(value: Any, int_flag: int) -> int:
+    if type(value) is int:
+        return int_flag
+    if type(value) is float:
+        return 0
+    raise ValueError(f"{value!r} isn't a number")
+
+
+def _arrow_flags(arrows: Any) -> List[int]:
+    """
+    The flags for each arrow, ValueError if they don't fit the arrow columns
+    """
+    if not isinstance(arrows, list):
+        raise ValueError("arrows isn't a list")
+    flags: List[int] = []
+    for arrow in arrows:
+        if not isinstance(arrow, dict) or set(arrow) - _ARROW_KEYS \
+                or not isinstance(arrow.get("type"), str):
+            raise ValueError(f"{arrow!r} isn't an arrow")
+        arrow_flags = _number_flag(arrow["evolution"], ARROW_EVOLUTION_INT)
+        if "evolution_start" in arrow:
+            arrow_flags |= HAS_EVOLUTION_START | _number_flag(
+                arrow["evolution_start"], ARROW_EVOLUTION_START_INT)
+        flags.append(arrow_flags)
+    return flags
+
+
+def _node_flags(datum: NodeDataType) -> Tuple[int, List[int], Dict[str, Any]]:
+    """
+    (node flags, arrow flags, the keys the columns can't hold) of a node
+    """
+    extra = {key: value for key, value in datum.items() if key not in _NODE_KEYS}
+    flags = _number_flag(datum["evolution"], EVOLUTION_INT) \
+        | _number_flag(datum["visibility"], VISIBILITY_INT)
+    if "dependencies" in datum:
+        flags |= HAS_DEPENDENCIES
+    if "subcat" in datum:
+        flags |= HAS_SUBCAT
+    if "optional" in datum:
+        if isinstance(datum["optional"], bool):
+            flags |= HAS_OPTIONAL
+        else:
+            extra["optional"] = datum["optional"]
+
+    arrow_flags: List[int] = []
+    if "arrows" in datum:
+        try:
+            arrow_flags = _arrow_flags(datum["arrows"])
+            flags |= HAS_ARROWS
+        except ValueError:  # null or odd, the table only has what it could read
+            extra["arrows"] = datum["arrows"]
+            arrow_flags = [0]*len(datum["arrows"] or [])
+    return flags, arrow_flags, extra
+
+
+def write_binary_map(map_data: Dict[str, Any], path: Path) -> None:
+    """
+    Writes map_data, as from json.load, to path in the binary format
+    """
+    node_data: List[NodeDataType] = map_data["nodes"]
+    interchange_data: List[InterchangeDataType] = map_data.get("interchanges", [])
+    nodes = node_table_from_node_data(node_data, interchange_data)
+
+    node_flags: List[int] = []
+    arrow_flags: List[int] = []
+    extras: List[str] = []
+    for datum in node_data:
+        flags, datum_arrow_flags, extra = _node_flags(datum)
+        node_flags.append(flags)
+        arrow_flags.extend(datum_arrow_flags)
+        extras.append(json.dumps(extra) if extra else "")
+    if len(arrow_flags) != len(nodes.arrow_node):
+        raise ValueError("Couldn't match the arrows to the table's")
+
+    # interchanges with no members aren't in the table, they're kept as they are
+    memberless: List[Tuple[int, InterchangeDataType]] = []
+    member_rows: List[List[int]] = []
+    node_index = {code: row for row, code in enumerate(nodes.codes[:len(node_data)])}
+    for position, datum in enumerate(interchange_data):
+        if not datum["interchanges"]:
+            memberless.append((position, datum))
+            continue
+        extra = {key: value for key, value in datum.items() if key not in _INTERCHANGE_KEYS}
+        node_flags.append(HAS_DEPENDENCIES if "dependencies" in datum else 0)
+        rows = interchange_member_rows(datum["interchanges"], node_index)
+        if [nodes.codes[row] for row in rows] != datum["interchanges"]:
+            # unknown or repeated codes, the table skips them but the file
+            # gives them back
+            extra["interchanges"] = datum["interchanges"]
+        member_rows.append(rows)
+        extras.append(json.dumps(extra) if extra else "")
+
+    member_indptr = np.zeros(len(member_rows) + 1, dtype=np.intp)
+    np.cumsum([len(rows) for rows in member_rows], out=member_indptr[1:])
+
+    arrays = {name: np.ascontiguousarray(getattr(nodes, name)) for name in ARRAY_FIELDS}
+    arrays["node_flags"] = np.array(node_flags, dtype=np.uint8)
+    arrays["arrow_flags"] = np.array(arrow_flags, dtype=np.uint8)
+    arrays["member_indptr"] = member_indptr
+    arrays["member_indices"] = np.array(
+        [row for rows in member_rows for row in rows], dtype=np.intp)
+    for name, strings in [*((name, getattr(nodes, name)) for name in STRING_FIELDS),
+                          ("extras", extras)]:
+        arrays[f"{name}.utf8"], arrays[f"{name}.offsets"] = pack_strings(strings)
+    layout, size = array_layout(arrays)
+
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "map": {key: value for key, value in map_data.items()
+                if key not in ("nodes", "interchanges")},
+        "has_interchanges": "interchanges" in map_data,
+        "memberless_interchanges": memberless,
+        "n_nodes": len(node_data),
+        **{name: getattr(nodes, name) for name in CATEGORY_FIELDS},
+        "layout": layout
+    }).encode()
+    data_start = -(-(len(MAGIC) + _HEADER_LENGTH.size + len(header))//ALIGN)*ALIGN
+
+    buffer = bytearray(data_start + size)
+    buffer[:len(MAGIC)] = MAGIC
+    _HEADER_LENGTH.pack_into(buffer, len(MAGIC), len(header))
+    header_start = len(MAGIC) + _HEADER_LENGTH.size
+    buffer[header_start:header_start + len(header)] = header
+    write_arrays(buffer, arrays, layout, data_start)
+    write_atomic(path, bytes(buffer))
+
+
+def _read_binary_map(path: Path) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    The header and every array, views of the file mapped copy-on-write
+    """
+    with path.open("rb") as data_fh:
+        mapped = mmap.mmap(data_fh.fileno(), 0, access=mmap.ACCESS_COPY)
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} isn't a binary map")
+    header_length, = _HEADER_LENGTH.unpack_from(mapped, len(MAGIC))
+    header_start = len(MAGIC) + _HEADER_LENGTH.size
+    header = json.loads(mapped[header_start:header_start + header_length])
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(f"{path} is version {header['version']}, not {FORMAT_VERSION}")
+    data_start = -(-(header_start + header_length)//ALIGN)*ALIGN
+    # the arrays keep the mapping open, it goes with the last of them
+    return header, array_views(mapped, header["layout"], data_start)
+
+
+def load_binary_table(path: Path) -> Tuple[Dict[str, Any], NodeTable]:
+    """
+    load_node_table for binary maps, the other top level entries (e.g.
+    "title") and the NodeTable
+    """
+    header, arrays = _read_binary_map(path)
+    strings = {
+        name: unpack_strings(arrays[f"{name}.utf8"], arrays[f"{name}.offsets"])
+        for name in STRING_FIELDS
+    }
+    nodes = NodeTable(
+        **strings,
+        **{name: arrays[name] for name in ARRAY_FIELDS},
+        **{name: header[name] for name in CATEGORY_FIELDS}
+    )
+    return header["map"], nodes
+
+
+def load_map_table(path: Path) -> Tuple[Dict[str, Any], NodeTable]:
+    """
+    A map's other top level entries and NodeTable, from JSON or a binary map
+    """
+    if path.suffix == BINARY_SUFFIX:
+        return load_binary_table(path)
+    return load_node_table(path)
+
+
+def _number(value: float, is_int: int) -> Any:
+    return int(value) if is_int else float(value)
+
+
+def binary_map_data(path: Path) -> Dict[str, Any]:
+    """
+    The binary map at path as the JSON data it was written from
+    """
+    header, arrays = _read_binary_map(path)
+    codes, titles, extras = (
+        unpack_strings(arrays[f"{name}.utf8"], arrays[f"{name}.offsets"])
+        for name in (*STRING_FIELDS, "extras")
+    )
+    types, subcats, arrow_types = (header[name] for name in CATEGORY_FIELDS)
+    node_flags = arrays["node_flags"].tolist()
+    dep_indptr = arrays["dep_indptr"].tolist()
+    dep_indices = arrays["dep_indices"].tolist()
+
+    def dependencies(row: int) -> List[str]:
+        return [codes[child] for child in dep_indices[dep_indptr[row]:dep_indptr[row + 1]]]
+
+    # arrows are in node order, arrow_indptr[row] is the first of row's
+    n_nodes = header["n_nodes"]
+    arrow_indptr = np.searchsorted(arrays["arrow_node"], np.arange(n_nodes + 1)).tolist()
+    arrow_flags = arrays["arrow_flags"].tolist()
+    arrow_evolution = arrays["arrow_evolution"].tolist()
+    arrow_evolution_start = arrays["arrow_evolution_start"].tolist()
+    arrow_type_idx = arrays["arrow_type_idx"].tolist()
+
+    node_data: List[NodeDataType] = []
+    for row, (evolution, visibility, type_idx, subcat_idx, optional) in enumerate(zip(
+        arrays["evolution"][:n_nodes].tolist(),
+        arrays["visibility"][:n_nodes].tolist(),
+        arrays["type_idx"][:n_nodes].tolist(),
+        arrays["subcat_idx"][:n_nodes].tolist(),
+        arrays["optional"][:n_nodes].tolist()
+    )):
+        flags = node_flags[row]
+        datum: NodeDataType = {"code": codes[row], "title": titles[row], "type": types[type_idx]}
+        if flags & HAS_DEPENDENCIES:
+            datum["dependencies"] = dependencies(row)
+        datum["visibility"] = _number(visibility, flags & VISIBILITY_INT)
+        datum["evolution"] = _number(evolution, flags & EVOLUTION_INT)
+        if flags & HAS_SUBCAT:
+            datum["subcat"] = None if subcat_idx == NO_SUBCAT else subcats[subcat_idx]
+        if flags & HAS_OPTIONAL:
+            datum["optional"] = optional
+        if flags & HAS_ARROWS:
+            datum["arrows"] = []
+            for arrow in range(arrow_indptr[row], arrow_indptr[row + 1]):
+                arrow_datum = {
+                    "evolution": _number(
+                        arrow_evolution[arrow], arrow_flags[arrow] & ARROW_EVOLUTION_INT),
+                    "type": arrow_types[arrow_type_idx[arrow]]
+                }
+                if arrow_flags[arrow] & HAS_EVOLUTION_START:
+                    arrow_datum["evolution_start"] = _number(
+                        arrow_evolution_start[arrow],
+                        arrow_flags[arrow] & ARROW_EVOLUTION_START_INT)
+                datum["arrows"].append(arrow_datum)
+        if extras[row]:
+            datum.update(json.loads(extras[row]))
+        node_data.append(datum)
+
+    member_indptr = arrays["member_indptr"].tolist()
+    member_indices = arrays["member_indices"].tolist()
+    interchange_data: List[InterchangeDataType] = []
+    for interchange, row in enumerate(range(n_nodes, len(codes))):
+        datum = {
+            "code": codes[row],
+            "title": titles[row],
+            "interchanges": [
+                codes[member] for member in
+                member_indices[member_indptr[interchange]:member_indptr[interchange + 1]]
+            ]
+        }
+        if node_flags[row] & HAS_DEPENDENCIES:
+            datum["dependencies"] = dependencies(row)
+        if extras[row]:
+            datum.update(json.loads(extras[row]))
+        interchange_data.append(datum)
+    for position, datum in header["memberless_interchanges"]:
+        interchange_data.insert(position, datum)
+
+    map_data = {**header["map"], "nodes": node_data}
+    if header["has_interchanges"]:
+        map_data["interchanges"] = interchange_data
+    return map_data
+
+
+if __name__ == "__main__":
+    for path in map(Path, sys.argv[1:]):
+        if path.suffix == BINARY_SUFFIX:
+            with path.with_suffix(".json").open("w") as data_fh:
+                json.dump(binary_map_data(path), data_fh, indent=4)
+        else:
+            with path.open("r") as data_fh:
+                write_binary_map(json.load(data_fh), path.with_suffix(BINARY_SUFFIX))
@@ -0,0 +1,119 @@
+"""
+Renders a figure once per format and writes the result wherever it's wanted
+
+Serialising is the slow part of saving (SVG especially), so each format is
+rendered to bytes once and the same bytes go to every destination: files,
+stdout, or anything else with a binary write.
+
+Files are written to a temp file next to them and renamed into place, so
+anything reading them (or a batch run racing this one) sees the old image or
+the new one, never half of one.
+"""
+from __future__ import annotations
+from contextlib import suppress
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Optional, Sequence, Tuple, Union
+import os
+import tempfile
+
+from matplotlib.figure import Figure
+
+
+ImageSinkType = Union[Path, BinaryIO]
+# (image format, where to write it)
+ImageDestinationType = Tuple[str, ImageSinkType]
+
+PROC_STATUS = Path("/proc/self/status")
+# for new files where the umask can't be read
+DEFAULT_MODE = 0o644
+
+
+def figure_images(fig: Figure, image_formats: Sequence[str]) -> Dict[str, bytes]:
+    """
+    fig rendered once in each format
+    """
+    images: Dict[str, bytes] = {}
+    for image_format in dict.fromkeys(image_formats):
+        image_buffer = BytesIO()
+        fig.savefig(image_buffer, format=image_format)
+        images[image_format] = image_buffer.getvalue()
+    return images
+
+
+def _umask() -> Optional[int]:
+    """
+    The process's umask, None where it can't be read (anywhere but Linux).
+    os.umask can only read it by setting it, which races other threads
+    creating files
+    """
+    try:
+        with PROC_STATUS.open() as status_fh:
+            for line in status_fh:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+    return None
+
+
+def _new_file_mode() -> int:
+    """
+    What a plain open() would give a new file, the temp files start as 0600
+    """
+    umask = _umask()
+    return DEFAULT_MODE if umask is None else 0o666 & ~umask
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """
+    Writes data to path via a temp file in the same directory and a rename,
+    keeping path's mode if it's already there
+    """
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = _new_file_mode()
+
+    # dotted so directory scans (e.g. RenderCache.evict) skip it
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(tmp_fd, "wb") as tmp_fh:
+            tmp_fh.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def write_image(image: bytes, sink: ImageSinkType) -> None:
+    if isinstance(sink, Path):
+        write_atomic(sink, image)
+    else:
+        sink.write(image)
+        sink.flush()
+
+
+def export_figure(
+    fig: Figure, destinations: Iterable[ImageDestinationType]
+) -> Dict[str, bytes]:
+    """
+    Renders fig once for each format in destinations and writes it to every
+    destination of that format. Returns the images by format
+    """
+    destinations = list(destinations)
+    images = figure_images(fig, [image_format for image_format, _ in destinations])
+    for image_format, sink in destinations:
+        write_image(images[image_format], sink)
+    return images
+
+
+def image_format_of(sink: ImageSinkType, default: str = "svg") -> str:
+    """
+    The format to write to sink, from a path's suffix if it has one
+    """
+    if isinstance(sink, Path) and sink.suffix:
+        return sink.suffix[1:].lower()
+    return default
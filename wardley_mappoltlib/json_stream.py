@@ -0,0 +1,149 @@
+"""
+Reads map JSON files a node at a time
+
+json.load holds the raw text and the whole dict tree in memory at once, for
+big maps it's better to hand out each entry of "nodes" and "interchanges" as
+soon as it's parsed.
+
+Only the top level is tokenized here, each node is decoded by the stdlib's C
+scanner via JSONDecoder.raw_decode. ijson (yajl2_c backend) was tried too and
+was slower, building each node from its events in Python costs more than the
+scanner saves.
+"""
+from __future__ import annotations
+from json import JSONDecodeError, JSONDecoder
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, TextIO, Tuple
+import re
+
+from wardley_mappoltlib.node_table import NodeTable, node_table_from_node_data
+from wardley_mappoltlib.nodes import InterchangeDataType, Node, NodeDataType
+
+
+STREAMED_KEYS = ("nodes", "interchanges")
+CHUNK_SIZE = 1 << 16
+
+MapEventType = Tuple[str, Any]
+
+
+class _TextStream:
+    """
+    Just enough of a JSON tokenizer to walk the top level of a map, values
+    below that are handed to JSONDecoder.raw_decode
+    """
+
+    _whitespace = " \t\n\r"
+    _delimiters = tuple(",:]}" + _whitespace)
+    _skip_whitespace = re.compile(r"[ \t\n\r]*").match
+
+    def __init__(self, data_fh: TextIO, chunk_size: int = CHUNK_SIZE) -> None:
+        self._fh = data_fh
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._fh.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # drop what's been parsed, so memory is bounded by the largest value
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self._pos = self._skip_whitespace(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise JSONDecodeError("Unexpected end of file", self._buffer, self._pos)
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise JSONDecodeError(f"Expected one of {chars!r}", self._buffer, self._pos)
+        self._pos += 1
+        return char
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number cut off by the end of a chunk still decodes (1.25 -> 1.),
+            # valid JSON always has one of these after a value
+            if self._buffer[end:end + 1] in self._delimiters or not self._fill():
+                self._pos = end
+                return value
+
+
+def iter_map_data(data_fh: TextIO) -> Iterator[MapEventType]:
+    """
+    Yields (key, value) for each top level entry of a map, except "nodes" and
+    "interchanges" which yield (key, item) once per item
+    """
+    stream = _TextStream(data_fh)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key in STREAMED_KEYS and stream.peek() == "[":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.expect("]")
+            else:
+                while True:
+                    yield key, stream.value()
+                    if stream.expect(",]") == "]":
+                        break
+        else:
+            yield key, stream.value()
+        if stream.expect(",}") == "}":
+            return
+
+
+def iter_nodes(data_path: Path) -> Iterator[Node]:
+    """
+    Yields a Node for each of the map's nodes, without loading the whole file
+    """
+    with data_path.open("r") as data_fh:
+        for key, node_datum in iter_map_data(data_fh):
+            if key == "nodes":
+                yield Node.from_dict(node_datum)
+
+
+def load_node_table(data_path: Path) -> Tuple[Dict[str, Any], NodeTable]:
+    """
+    Loads a map straight into a NodeTable, a node at a time
+
+    Returns the other top level entries (e.g. "title") and the NodeTable.
+    """
+    other_data: Dict[str, Any] = {}
+    interchange_data: List[InterchangeDataType] = []
+
+    def node_data(data_fh: TextIO) -> Iterator[NodeDataType]:
+        # interchanges and the rest are collected on the way past, the table
+        # only reads interchange_data after this is exhausted
+        for key, value in iter_map_data(data_fh):
+            if key == "nodes":
+                yield value
+            elif key == "interchanges":
+                interchange_data.append(value)
+            else:
+                other_data[key] = value
+
+    with data_path.open("r") as data_fh:
+        nodes = node_table_from_node_data(node_data(data_fh), interchange_data)
+    return other_data, nodes
@@ -0,0 +1,371 @@
+"""
+Label placement, pushing label boxes off each other and off obstacle points
+
+Everything here is plain arrays in display units (pixels), it knows nothing
+about matplotlib. Rather than comparing every label with every label and every
+point each iteration (which is what adjustText does), two spatial indexes keep
+the work local:
+
+* labels go in a uniform grid with cells the size of a typical label, each
+  label in every cell it covers, so overlapping labels always share a cell
+* points are binned once onto a fine grid with summed area tables, so the
+  number and centroid of the points under any box is O(1), however many
+  points there are along the dependency lines
+
+Pushing boxes apart gets the easy overlaps out of the way, then each label in
+turn tries a ring of positions around its node and takes the one that leaves
+it on the fewest labels and points. That's what clears labels sitting on
+lines, a push away from the points under a label just moves it onto the next
+line over.
+
+Where the labels add up to more area than the axes (a few thousand nodes on
+one figure) they can't all fit, whichever engine moves them. It still gets
+rid of what overlaps it can.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+# cell (ix, iy) -> ix*_ROW + iy, fine while |iy| < _ROW/2
+_ROW = np.int64(1 << 31)
+# cells along the longest side of the point grid
+_POINT_GRID_CELLS = 1024
+# labels are pushed this far (pixels) past touching, pushed to exactly
+# touching float noise leaves some still overlapping
+_LABEL_GAP = 1e-3
+
+
+def _rings(distances: np.ndarray, n_directions: int = 16) -> np.ndarray:
+    angles = np.arange(n_directions)*2*np.pi/n_directions
+    directions = np.column_stack([np.cos(angles), np.sin(angles)])
+    return (distances[:, np.newaxis, np.newaxis]*directions).reshape(-1, 2)
+
+
+# where labels try going, in label sizes from where they started, a band at a
+# time. Further bands are only tried by labels with nowhere clear nearer
+_CANDIDATE_BANDS = [
+    _rings(np.arange(0.5, 2.01, 0.5)),
+    _rings(np.arange(2.5, 4.01, 0.5)),
+    _rings(np.arange(4.5, 6.01, 0.5)),
+]
+
+
+class _Grid:
+    """
+    Uniform grid of boxes, each box in every cell it covers, for finding the
+    boxes that might overlap without comparing every pair
+    """
+
+    def __init__(self, lower: np.ndarray, upper: np.ndarray, cell_size: np.ndarray) -> None:
+        first = np.floor(lower/cell_size).astype(np.int64)
+        span = np.floor(upper/cell_size).astype(np.int64) - first + 1
+        counts = span[:, 0]*span[:, 1]
+        box = np.repeat(np.arange(len(lower)), counts)
+        # position of each cell within its box's run of cells
+        within = np.arange(len(box)) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = first[box] + np.column_stack([within//span[box, 1], within % span[box, 1]])
+
+        keys = cells[:, 0]*_ROW + cells[:, 1]
+        order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[order]
+        self.boxes = box[order]
+        self.n_boxes = len(lower)
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (box, other box) for every pair sharing a cell, each pair once with
+        box < other box. Overlapping boxes always share a cell
+        """
+        n_entries = len(self.sorted_keys)
+        run_starts = np.flatnonzero(np.r_[True, self.sorted_keys[1:] != self.sorted_keys[:-1]])
+        run_ends = np.r_[run_starts[1:], n_entries]
+        run_end = np.repeat(run_ends, np.diff(np.r_[run_starts, n_entries]))
+        # every entry with each later entry of its cell
+        later = run_end - np.arange(n_entries) - 1
+        first = np.repeat(np.arange(n_entries), later)
+        second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(later) - later, later)
+
+        box, other = self.boxes[first], self.boxes[second]
+        lower, upper = np.minimum(box, other), np.maximum(box, other)
+        # boxes covering several cells together are found once per cell
+        pair_keys = np.unique(lower*np.int64(self.n_boxes) + upper)
+        return pair_keys//self.n_boxes, pair_keys % self.n_boxes
+
+
+class _LabelCells:
+    """
+    The labels in each grid cell, kept up to date as labels move one at a
+    time, for the greedy pass
+    """
+
+    def __init__(self, centres: np.ndarray, size: np.ndarray, cell_size: np.ndarray) -> None:
+        self.size = size
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        for label, centre in enumerate(centres):
+            self.add(label, centre)
+
+    def _covered(self, lower: np.ndarray, upper: np.ndarray) -> Iterable[Tuple[int, int]]:
+        (x0, y0), (x1, y1) = np.floor(lower/self.cell_size).astype(int), \
+            np.floor(upper/self.cell_size).astype(int)
+        return ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+
+    def add(self, label: int, centre: np.ndarray) -> None:
+        half_size = self.size[label]/2
+        for cell in self._covered(centre - half_size, centre + half_size):
+            self._cells.setdefault(cell, set()).add(label)
+
+    def remove(self, label: int, centre: np.ndarray) -> None:
+        half_size = self.size[label]/2
+        for cell in self._covered(centre - half_size, centre + half_size):
+            self._cells[cell].discard(label)
+
+    def near(self, lower: np.ndarray, upper: np.ndarray) -> List[int]:
+        """
+        Every label that might overlap the box lower, upper
+        """
+        labels: Set[int] = set()
+        for cell in self._covered(lower, upper):
+            labels.update(self._cells.get(cell, ()))
+        return list(labels)
+
+
+class _PointDensity:
+    """
+    Points binned onto a fine grid, with summed area tables of the count and
+    the x and y totals, for the count and centroid of the points in any box
+    """
+
+    def __init__(self, points: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> None:
+        self.lower = lower
+        self.cell_size = max((upper - lower).max()/_POINT_GRID_CELLS, np.finfo(float).eps)
+        self.shape = np.ceil((upper - lower)/self.cell_size).astype(np.intp) + 1
+
+        cells = self._cells(points, np.floor)
+        flat = np.ravel_multi_index((cells[:, 0], cells[:, 1]), tuple(self.shape))
+        self.tables = [
+            self._summed_area(
+                np.bincount(flat, weights=weights, minlength=int(self.shape.prod())))
+            for weights in (None, points[:, 0], points[:, 1])
+        ]
+
+    def _cells(self, xy: np.ndarray, rounding) -> np.ndarray:
+        cells = rounding((xy - self.lower)/self.cell_size).astype(np.intp)
+        return np.clip(cells, 0, self.shape - 1)
+
+    def _summed_area(self, binned: np.ndarray) -> np.ndarray:
+        table = np.zeros(self.shape + 1)
+        table[1:, 1:] = binned.reshape(self.shape).cumsum(axis=0).cumsum(axis=1)
+        return table
+
+    def _box_sums(self, lower: np.ndarray, upper: np.ndarray, tables) -> List[np.ndarray]:
+        x0, y0 = self._cells(lower, np.floor).T
+        x1, y1 = (self._cells(upper, np.floor) + 1).T
+        return [table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0] for table in tables]
+
+    def count_in_boxes(self, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+        # differences of big sums, a little float noise where it's empty
+        return np.round(self._box_sums(lower, upper, self.tables[:1])[0])
+
+    def in_boxes(
+        self, lower: np.ndarray, upper: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The number of points in each box, and their centroid
+        """
+        count, sum_x, sum_y = self._box_sums(lower, upper, self.tables)
+        count = np.round(count)
+        centroid = np.column_stack([sum_x, sum_y])/np.maximum(count, 1)[:, np.newaxis]
+        return count, centroid
+
+
+def _push(
+    delta: np.ndarray, half_size: np.ndarray, tie_break: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For pairs of boxes delta (centre - other centre) apart, with summed half
+    sizes half_size, how far to move along the axis of least overlap to stop
+    them overlapping. Returns (move, overlapping)
+    """
+    rows = np.arange(len(delta))
+    overlap = half_size - np.abs(delta)
+    overlapping = (overlap > 0).all(axis=1)
+    axis = np.argmin(overlap, axis=1)
+    direction = np.sign(delta[rows, axis])
+    direction[direction == 0] = tie_break[direction == 0]
+
+    move = np.zeros_like(delta)
+    move[rows, axis] = direction*overlap[rows, axis]
+    move[~overlapping] = 0
+    return move, overlapping
+
+
+def _sum_by(index: np.ndarray, values: np.ndarray, length: int) -> np.ndarray:
+    return np.stack([
+        np.bincount(index, weights=values[:, dim], minlength=length)
+        for dim in range(values.shape[1])
+    ], axis=1)
+
+
+def place_labels(
+    boxes: np.ndarray,
+    points: Optional[np.ndarray] = None,
+    bounds: Optional[Tuple[float, float, float, float]] = None,
+    expand_points: Tuple[float, float] = (1.1, 1.2),
+    force_text: float = 1.0,
+    force_points: float = 0.2,
+    max_iterations: int = 200,
+    patience: int = 20,
+    greedy_passes: int = 3
+) -> Tuple[np.ndarray, int]:
+    """
+    Moves label boxes apart from each other and from points
+
+    boxes: (n, 4) x0, y0, x1, y1 of each label
+    points: (m, 2) obstacles, e.g. node markers and points along edges
+    bounds: x0, y0, x1, y1 the labels have to stay inside
+    expand_points: boxes are scaled by this when checked against points
+    force_text, force_points: fraction of an overlap resolved per iteration
+    patience: stop after this many iterations without fewer overlaps, on maps
+        too crowded for every label to fit it would never finish otherwise
+    greedy_passes: times round every label trying _CANDIDATE_BANDS, after
+        the pushing, stopping early once a pass moves nothing, once only
+        where the labels outsize bounds
+
+    Returns the (n, 2) offset of each label and the number of overlaps left,
+    label pairs plus points under labels
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    points = np.empty((0, 2)) if points is None else \
+        np.asarray(points, dtype=float).reshape(-1, 2)
+    n_labels = len(boxes)
+    if not n_labels:
+        return np.empty((0, 2)), 0
+
+    size = boxes[:, 2:] - boxes[:, :2]
+    start_centres = (boxes[:, :2] + boxes[:, 2:])/2
+    centres = start_centres.copy()
+    # a typical label, the longest would put most of a crowded map in one cell
+    cell_size = np.maximum(np.median(size, axis=0), np.finfo(float).eps)
+
+    point_density = None
+    if len(points):
+        if bounds is not None:
+            lower, upper = np.array(bounds[:2], dtype=float), np.array(bounds[2:], dtype=float)
+        else:
+            margin = size.max(axis=0)
+            lower = np.minimum(points.min(axis=0), boxes[:, :2].min(axis=0) - margin)
+            upper = np.maximum(points.max(axis=0), boxes[:, 2:].max(axis=0) + margin)
+        point_density = _PointDensity(points, lower, upper)
+
+    def clip(centres: np.ndarray, label_size: np.ndarray = size) -> np.ndarray:
+        if bounds is None:
+            return centres
+        lower = np.array(bounds[:2]) + label_size/2
+        return np.clip(centres, lower, np.maximum(np.array(bounds[2:]) - label_size/2, lower))
+
+    def label_moves(centres: np.ndarray) -> Tuple[np.ndarray, int]:
+        label, other = _Grid(centres - size/2, centres + size/2, cell_size).pairs()
+        move, overlapping = _push(
+            centres[label] - centres[other],
+            (size[label] + size[other] + _LABEL_GAP)/2,
+            np.ones(len(label))
+        )
+        # each label of an overlapping pair moves half the overlap, opposite ways
+        moves = _sum_by(label, move/2, n_labels) - _sum_by(other, move/2, n_labels)
+        return force_text*moves, np.count_nonzero(overlapping)
+
+    def point_moves(centres: np.ndarray) -> Tuple[np.ndarray, int]:
+        if point_density is None:
+            return np.zeros_like(centres), 0
+        half_size = size*expand_points/2
+        count, centroid = point_density.in_boxes(centres - half_size, centres + half_size)
+        # away from the middle of whatever's under the label, a label over a
+        # line covers lots of points but should only move as far as for one
+        move, _ = _push(centres - centroid, half_size, np.ones(n_labels))
+        move[count == 0] = 0
+        return force_points*move, int(count.sum())
+
+    # the layout handed back is the best seen, starting with the one given, so
+    # it's never worse than that. Labels on labels count first, they matter
+    # more than labels on points
+    best_centres, best_overlaps = centres, None
+    since_best = 0
+    for _ in range(max_iterations):
+        label_move, n_label_overlaps = label_moves(centres)
+        point_move, n_point_overlaps = point_moves(centres)
+        n_overlaps = (n_label_overlaps, n_point_overlaps)
+        if best_overlaps is None or n_overlaps < best_overlaps:
+            best_centres, best_overlaps, since_best = centres, n_overlaps, 0
+        else:
+            since_best += 1
+            if since_best >= patience:
+                break
+        if not sum(n_overlaps):
+            break
+        centres = clip(centres + point_move + label_move)
+
+    centres = best_centres.copy()
+    cells = _LabelCells(centres, size, cell_size)
+    half_expanded = size*expand_points/2
+    bands = _CANDIDATE_BANDS
+    if bounds is not None and \
+            size.prod(axis=1).sum() > (bounds[2] - bounds[0])*(bounds[3] - bounds[1]):
+        # more label than room for it, somewhere clear further out is as
+        # unlikely as nearer in and much dearer to look for, and passes after
+        # the first shuffle labels between crowded spots for little gain
+        bands = bands[:1]
+        greedy_passes = min(greedy_passes, 1)
+
+    def candidate_overlaps(
+        label: int, candidates: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The labels and points label would be on at each of candidates
+        """
+        others = np.array(
+            cells.near(candidates.min(axis=0) - size[label], candidates.max(axis=0) + size[label]),
+            dtype=np.intp)
+        others = others[others != label]
+        half_size = (size[label] + size[others] + _LABEL_GAP)/2
+        on_label = np.abs(candidates[:, 0, np.newaxis] - centres[others, 0]) < half_size[:, 0]
+        on_label &= np.abs(candidates[:, 1, np.newaxis] - centres[others, 1]) < half_size[:, 1]
+        n_labels_on = np.count_nonzero(on_label, axis=1)
+        if point_density is None:
+            return n_labels_on, np.zeros(len(candidates))
+        return n_labels_on, point_density.count_in_boxes(
+            candidates - half_expanded[label], candidates + half_expanded[label])
+
+    for _ in range(greedy_passes):
+        moved = False
+        for label in range(n_labels):
+            candidates, scores = [], []
+            for offsets in bands:
+                band = clip(start_centres[label] + offsets*size[label], size[label])
+                if not candidates:
+                    # the current position first, so ties stay put
+                    band = np.vstack([centres[label], band])
+                n_labels_on, n_points_on = candidate_overlaps(label, band)
+                candidates.append(band)
+                scores.append((n_labels_on, n_points_on))
+                if ((n_labels_on == 0) & (n_points_on == 0)).any():
+                    break
+
+            candidates = np.concatenate(candidates)
+            n_labels_on, n_points_on = (np.concatenate(score) for score in zip(*scores))
+            distance = np.abs(candidates - start_centres[label]).sum(axis=1)
+            # fewest labels, then fewest points, then nearest its node
+            best = np.lexsort((distance, n_points_on, n_labels_on))[0]
+            if (n_labels_on[best], n_points_on[best]) < (n_labels_on[0], n_points_on[0]):
+                cells.remove(label, centres[label])
+                centres[label] = candidates[best]
+                cells.add(label, centres[label])
+                moved = True
+        if not moved:
+            break
+
+    # only ever moved labels to fewer overlaps of their own, so no worse
+    n_overlaps = label_moves(centres)[1] + point_moves(centres)[1]
+    return centres - start_centres, n_overlaps
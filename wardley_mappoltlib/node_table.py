@@ -0,0 +1,252 @@
+"""
+Columnar storage for a whole Wardley Map
+
+Node and Interchange are nice for poking at one component, but the plotting
+code only ever wants whole columns (every evolution, every visibility, every
+edge), so this keeps the map as arrays and integer codes instead
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Iterable, List, Tuple
+import copy
+
+import numpy as np
+
+from wardley_mappoltlib.nodes import InterchangeDataType, NodeDataType
+
+
+INTERCHANGE_TYPE = "interchange"
+NO_SUBCAT = -1
+
+
+@dataclass
+class NodeTable:
+    """
+    The nodes and interchanges of a Wardley Map, one row per node
+
+    Strings that repeat (type, subcat, arrow type) are stored as integer codes
+    into a list of categories. Dependencies are CSR style, the children of row
+    `i` are `dep_indices[dep_indptr[i]:dep_indptr[i + 1]]`. Arrows are one row
+    per arrow, `arrow_node` being the row of the node the arrow belongs to.
+    """
+
+    codes: List[str]
+    titles: List[str]
+    types: List[str]
+    type_idx: np.ndarray
+    subcats: List[str]
+    subcat_idx: np.ndarray
+    evolution: np.ndarray
+    visibility: np.ndarray
+    # the extent of an interchange, for plain nodes these equal evolution
+    evolution_min: np.ndarray
+    evolution_max: np.ndarray
+    optional: np.ndarray
+
+    dep_indptr: np.ndarray
+    dep_indices: np.ndarray
+
+    arrow_node: np.ndarray
+    arrow_evolution: np.ndarray
+    arrow_evolution_start: np.ndarray
+    arrow_types: List[str]
+    arrow_type_idx: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def code_index(self) -> Dict[str, int]:
+        return {code: row for row, code in enumerate(self.codes)}
+
+    def type_mask(self, node_type: str) -> np.ndarray:
+        if node_type not in self.types:
+            return np.zeros(len(self), dtype=bool)
+        return self.type_idx == self.types.index(node_type)
+
+    def subcat_mask(self, subcat: str) -> np.ndarray:
+        if subcat not in self.subcats:
+            return np.zeros(len(self), dtype=bool)
+        return self.subcat_idx == self.subcats.index(subcat)
+
+    @property
+    def interchange_mask(self) -> np.ndarray:
+        return self.type_mask(INTERCHANGE_TYPE)
+
+    def with_own_positions(self) -> NodeTable:
+        """
+        A table sharing everything with this one but evolution and visibility,
+        which are copied, for drawing (which moves nodes) without moving this one's
+
+        The graph's cached arrays come along (worked out first if need be), so
+        drawing a table again doesn't rebuild them
+        """
+        self.edge_optional  # and edge_rows, which it's made from
+        table = copy.copy(self)
+        table.evolution = self.evolution.copy()
+        table.visibility = self.visibility.copy()
+        return table
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The (parent rows, child rows) of every dependency
+        """
+        return self.edge_rows[:, 0], self.edge_rows[:, 1]
+
+    # the graph doesn't change once loaded (positions do, while drawing), so
+    # these are worked out once per table
+
+    @cached_property
+    def edge_rows(self) -> np.ndarray:
+        """
+        (n_edges, 2) rows of the parent then child of every dependency
+        """
+        parents = np.repeat(
+            np.arange(len(self), dtype=np.intp), np.diff(self.dep_indptr)
+        )
+        return np.column_stack([parents, self.dep_indices]).astype(np.intp)
+
+    @cached_property
+    def edge_optional(self) -> np.ndarray:
+        """
+        Whether each dependency is optional, i.e. either end is
+        """
+        return self.optional[self.edge_rows].any(axis=1)
+
+
+class _Categories:
+    """
+    Hands out integer codes for strings, in order of first appearance
+    """
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def code(self, name: str) -> int:
+        if (idx := self._index.get(name)) is None:
+            idx = self._index[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+
+def interchange_member_rows(
+    interchange_codes: List[str], node_index: Dict[str, int]
+) -> List[int]:
+    """
+    The rows of an interchange's nodes, codes missing from node_index are
+    skipped and duplicates only counted once, as Interchange.from_node_graph
+    """
+    return [
+        node_index[code] for code in dict.fromkeys(interchange_codes) if code in node_index
+    ]
+
+
+def node_table_from_node_data(
+    graph_data: Iterable[NodeDataType],
+    interchange_data: Iterable[InterchangeDataType] = ()
+) -> NodeTable:
+    """
+    builds a NodeTable from graph_data and interchange dictionaries, without
+    going through Node objects
+    """
+    codes: List[str] = []
+    titles: List[str] = []
+    type_idx: List[int] = []
+    subcat_idx: List[int] = []
+    evolution: List[float] = []
+    visibility: List[float] = []
+    optional: List[bool] = []
+    dependencies: List[List[str]] = []
+
+    arrow_node: List[int] = []
+    arrow_evolution: List[float] = []
+    arrow_evolution_start: List[float] = []
+    arrow_type_idx: List[int] = []
+
+    types = _Categories()
+    subcats = _Categories()
+    arrow_types = _Categories()
+
+    for row, datum in enumerate(graph_data):
+        codes.append(datum["code"])
+        titles.append(datum["title"])
+        type_idx.append(types.code(datum["type"]))
+        subcat = datum.get("subcat")
+        subcat_idx.append(NO_SUBCAT if subcat is None else subcats.code(subcat))
+        evolution.append(datum["evolution"])
+        visibility.append(datum["visibility"])
+        optional.append(datum.get("optional", False))
+        dependencies.append(datum.get("dependencies", []))
+
+        for arrow_datum in datum.get("arrows") or []:
+            arrow_node.append(row)
+            arrow_evolution.append(arrow_datum["evolution"])
+            arrow_evolution_start.append(
+                arrow_datum.get("evolution_start", datum["evolution"])
+            )
+            arrow_type_idx.append(arrow_types.code(arrow_datum["type"]))
+
+    evolution_min: List[float] = list(evolution)
+    evolution_max: List[float] = list(evolution)
+
+    code_index: Dict[str, int] = {code: row for row, code in enumerate(codes)}
+    # interchanges are made of nodes, not other interchanges
+    node_index = dict(code_index)
+    for datum in interchange_data:
+        interchange_codes: List[str] = datum["interchanges"]
+        if not interchange_codes:
+            continue
+        member_rows = interchange_member_rows(interchange_codes, node_index)
+        member_visibility = {visibility[row] for row in member_rows}
+        if len(member_visibility) != 1:
+            raise ValueError(
+                "The visibility for the interchange nodes is not identical."
+                "This is not valid.\n"
+                f"Interchange codes {interchange_codes}"
+            )
+        ev_min = min(evolution[row] for row in member_rows)
+        ev_max = max(evolution[row] for row in member_rows)
+
+        code_index[datum["code"]] = len(codes)
+        codes.append(datum["code"])
+        titles.append(datum["title"])
+        type_idx.append(types.code(INTERCHANGE_TYPE))
+        subcat_idx.append(NO_SUBCAT)
+        # will be modified by plotting code
+        evolution.append((ev_min + ev_max)/2)
+        visibility.append(member_visibility.pop())
+        evolution_min.append(ev_min)
+        evolution_max.append(ev_max)
+        optional.append(False)
+        dependencies.append(datum.get("dependencies", []))
+
+    dep_indptr = np.zeros(len(codes) + 1, dtype=np.intp)
+    dep_indptr[1:] = np.cumsum([len(deps) for deps in dependencies])
+    dep_indices = np.fromiter(
+        (code_index[code] for deps in dependencies for code in deps),
+        dtype=np.intp,
+        count=dep_indptr[-1]
+    )
+
+    return NodeTable(
+        codes=codes,
+        titles=titles,
+        types=types.names,
+        type_idx=np.array(type_idx, dtype=np.intp),
+        subcats=subcats.names,
+        subcat_idx=np.array(subcat_idx, dtype=np.intp),
+        evolution=np.array(evolution, dtype=float),
+        visibility=np.array(visibility, dtype=float),
+        evolution_min=np.array(evolution_min, dtype=float),
+        evolution_max=np.array(evolution_max, dtype=float),
+        optional=np.array(optional, dtype=bool),
+        dep_indptr=dep_indptr,
+        dep_indices=dep_indices,
+        arrow_node=np.array(arrow_node, dtype=np.intp),
+        arrow_evolution=np.array(arrow_evolution, dtype=float),
+        arrow_evolution_start=np.array(arrow_evolution_start, dtype=float),
+        arrow_types=arrow_types.names,
+        arrow_type_idx=np.array(arrow_type_idx, dtype=np.intp)
+    )
@@ -4,7 +4,6 @@ It's less effort to just code up the dfs search using keys and dicts in the
 one place I need it
 """
 from __future__ import annotations
-from copy import deepcopy
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Union
 
@@ -23,10 +22,10 @@ class Arrow:
 
     @classmethod
     def from_dict(cls, data: ArrowDataType, evolution_start):
-        _data_to_modify = deepcopy(data)
-        if "evolution_start" not in data:
-            _data_to_modify["evolution_start"] = evolution_start
-        return cls(**_data_to_modify)
+        """
+        data is only read, never modified, so it isn't copied
+        """
+        return cls(**{"evolution_start": evolution_start, **data})
 
 
 NodeDataType = Dict[str, Union[str, float, List[str], List[ArrowDataType]]]
@@ -53,18 +52,15 @@ class Node:
 
     @classmethod
     def from_dict(cls, data: NodeDataType) -> Node:
-        _data_to_modify = deepcopy(data)
-        arrows: List[Arrow] = []
-        if "arrows" in _data_to_modify:
-            if arrows_data := _data_to_modify.pop("arrows"):
-                arrows = [
-                    Arrow.from_dict(
-                        arrow_datum,
-                        evolution_start=_data_to_modify["evolution"]
-                    )
-                    for arrow_datum in arrows_data
-                ]
-        return cls(**_data_to_modify, arrows=arrows)
+        """
+        data is only read, never modified, so it isn't copied. The Node shares
+        the dependencies list with data
+        """
+        arrows: List[Arrow] = [
+            Arrow.from_dict(arrow_datum, evolution_start=data["evolution"])
+            for arrow_datum in data.get("arrows") or []
+        ]
+        return cls(**{**data, "arrows": arrows})
 
 
 def nodes_from_node_data(graph_data: List[NodeDataType]) -> list[Node]:
@@ -107,12 +103,23 @@ class Interchange:
     children = []
 
     @classmethod
-    def from_node_graph(cls, code, title, interchange_codes: List[str], nodes: list[Node]) -> Interchange:
+    def from_node_graph(
+        cls, code, title, interchange_codes: List[str], nodes: list[Node],
+        code_node_map: Optional[CodeNodeMapType] = None
+    ) -> Interchange:
+        """
+        Pass code_node_map (see index_nodes) when building many interchanges
+        from the same nodes, so the nodes are only indexed once
+        """
         if not interchange_codes:
             return None
+        if code_node_map is None:
+            code_node_map = index_nodes(nodes)
 
+        # codes missing from nodes are skipped, duplicates only counted once
         interchange_nodes: List[Node] = [
-            node for node in nodes if node.code in interchange_codes
+            code_node_map[node_code] for node_code in dict.fromkeys(interchange_codes)
+            if node_code in code_node_map
         ]
         visibility = interchange_nodes[0].visibility
         if not all(visibility == node.visibility for node in interchange_nodes):
@@ -130,20 +137,60 @@ class Interchange:
         return cls(code, title, visibility, evolution, ev_min, ev_max, interchange_nodes)
 
     @classmethod
-    def from_dict(cls, data: InterchangeDataType, nodes: list[Node]) -> Interchange:
-        return cls.from_node_graph(data["code"], data["title"], data["interchanges"], nodes)
+    def from_dict(
+        cls, data: InterchangeDataType, nodes: list[Node],
+        code_node_map: Optional[CodeNodeMapType] = None
+    ) -> Interchange:
+        return cls.from_node_graph(
+            data["code"], data["title"], data["interchanges"], nodes, code_node_map)
 
 
 NodesType = list[Union[Node, Interchange]]
+CodeNodeMapType = Dict[str, Union[Node, Interchange]]
+
+
+def index_nodes(nodes: NodesType) -> CodeNodeMapType:
+    """
+    code -> node lookup, build it once per map and share it
+    """
+    return {n.code: n for n in nodes}
 
 
-def build_node_graph(nodes: NodesType) -> None:
+def build_node_graph(
+    nodes: NodesType, code_node_map: Optional[CodeNodeMapType] = None
+) -> None:
     """
     Updates the Nodes to have neighbours and children
+
+    code_node_map must cover every node that is a dependency, it is built from
+    nodes if not given
     """
-    code_node_map: Dict[str, Node] = {n.code: n for n in nodes}
+    if code_node_map is None:
+        code_node_map = index_nodes(nodes)
 
     for a_node in nodes:
         for child_code in a_node.dependencies:
             child_node: Node = code_node_map[child_code]
             a_node.children.append(child_node)
+
+
+def node_graph_from_map_data(
+    graph_data: List[NodeDataType], interchange_data: List[InterchangeDataType]
+) -> NodesType:
+    """
+    builds the nodes, then the interchanges, then the graph, sharing a single
+    code -> node index between them
+    """
+    nodes: list[Node] = nodes_from_node_data(graph_data)
+    code_node_map: CodeNodeMapType = index_nodes(nodes)
+
+    interchanges: List[Interchange] = []
+    for interchange_datum in interchange_data:
+        interchange = Interchange.from_dict(interchange_datum, nodes, code_node_map)
+        if interchange is not None:
+            interchanges.append(interchange)
+    code_node_map.update(index_nodes(interchanges))
+
+    nodes: NodesType = nodes + interchanges
+    build_node_graph(nodes, code_node_map)
+    return nodes
@@ -0,0 +1,73 @@
+"""
+Named arrays laid out end to end in one buffer, for shared memory and the
+binary map files
+
+Each array starts on a cache line. Lists of strings go in as one UTF-8 array
+and an offsets array, see pack_strings.
+"""
+from __future__ import annotations
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+ALIGN = 64
+
+# (offset into the buffer, dtype string, shape)
+ArrayLayoutType = Tuple[int, str, Tuple[int, ...]]
+
+
+def pack_strings(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (UTF-8, offsets) for strings, NUL separated so unpacking is one decode
+    and one split. The offsets (in characters, separators included) are for
+    strings that have a NUL in them
+    """
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(string) + 1 for string in strings], out=offsets[1:])
+    return np.frombuffer("\0".join(strings).encode(), dtype=np.uint8), offsets
+
+
+def unpack_strings(utf8: np.ndarray, offsets: np.ndarray) -> List[str]:
+    joined = utf8.tobytes().decode()
+    strings = joined.split("\0")
+    # any NUL in a string means more pieces than strings
+    if len(strings) == len(offsets) - 1:
+        return strings
+    bounds = offsets.tolist()
+    return [joined[start:end - 1] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def array_layout(arrays: Dict[str, np.ndarray]) -> Tuple[Dict[str, ArrayLayoutType], int]:
+    """
+    Where each array goes, and the size of buffer they need
+    """
+    layout: Dict[str, ArrayLayoutType] = {}
+    size = 0
+    for name, array in arrays.items():
+        layout[name] = (size, array.dtype.str, array.shape)
+        size += -(-array.nbytes//ALIGN)*ALIGN
+    return layout, size
+
+
+def write_arrays(
+    buffer, arrays: Dict[str, np.ndarray], layout: Dict[str, ArrayLayoutType], base: int = 0
+) -> None:
+    for name, array in arrays.items():
+        offset, _, _ = layout[name]
+        np.ndarray(array.shape, array.dtype, buffer, base + offset)[...] = array
+
+
+def array_views(
+    buffer, layout: Dict[str, ArrayLayoutType], base: int = 0, writeable: bool = True
+) -> Dict[str, np.ndarray]:
+    """
+    The arrays in buffer, as views not copies
+    """
+    views: Dict[str, np.ndarray] = {}
+    for name, (offset, dtype, shape) in layout.items():
+        view = np.ndarray(tuple(shape), dtype, buffer, base + offset)
+        if not writeable:
+            view.flags.writeable = False
+        views[name] = view
+    return views
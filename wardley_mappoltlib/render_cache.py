@@ -0,0 +1,108 @@
+"""
+On disk cache of rendered maps
+
+Same idea as the requirements sha in tasks.py, if nothing that goes into an
+image has changed there's no point drawing it again
+"""
+from __future__ import annotations
+from hashlib import sha512
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+import json
+import os
+
+from wardley_mappoltlib.export import write_atomic
+
+
+DEFAULT_MAX_BYTES = 512*1024*1024
+
+
+def render_key(*parts: Any) -> str:
+    """
+    sha512 of parts, each normalised through json (sorted keys, no whitespace)
+
+    parts must be json-able, e.g. map data, marker maps, format and version
+    """
+    hasher = sha512()
+    for part in parts:
+        hasher.update(
+            json.dumps(part, sort_keys=True, separators=(",", ":")).encode()
+        )
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class RenderCache:
+    """
+    Rendered images keyed on render_key, the least recently used are evicted
+    once the cache is bigger than max_bytes
+
+    Safe to share between processes, entries are written to a temp file and
+    renamed into place and file mtimes are the LRU order
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # kept up to date by put, so it only has to scan the cache when it
+        # might be too big. Other processes' puts aren't counted, each scan
+        # catches up with them
+        self.total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """
+        (mtime, size, path) of every entry
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith("."):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # evicted by another process meanwhile
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        try:
+            replaced_bytes = path.stat().st_size
+        except FileNotFoundError:
+            replaced_bytes = 0
+        write_atomic(path, data)
+        self.total_bytes += len(data) - replaced_bytes
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until under max_bytes
+        """
+        entries = sorted(self._entries())
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+        self.total_bytes = total_bytes
@@ -0,0 +1,127 @@
+"""
+A NodeTable in shared memory, for handing a loaded map to worker processes
+
+Pickling a big table to every worker copies every column into every worker,
+so instead the owner copies the columns once into a shared memory block
+
+    with shared_node_table(nodes) as shared:
+        executor.submit(work, shared)  # shared is a few hundred bytes
+
+and each worker gets the same columns back without copying them
+
+    def work(shared):
+        with attached_node_table(shared) as nodes:
+            ...
+
+Attached arrays are read-only, several processes are looking at them, drawing
+moves nodes on its own copy of their positions. Codes and titles are stored
+as UTF-8 and decoded on attach, Python needs its own str anyway.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterator, List
+import threading
+
+import numpy as np
+
+from wardley_mappoltlib.node_table import NodeTable
+from wardley_mappoltlib.packed_arrays import (
+    ArrayLayoutType, array_layout, array_views, pack_strings, unpack_strings,
+    write_arrays
+)
+
+
+ARRAY_FIELDS = tuple(
+    field.name for field in fields(NodeTable) if field.type == "np.ndarray"
+)
+STRING_FIELDS = ("codes", "titles")
+CATEGORY_FIELDS = ("types", "subcats", "arrow_types")
+
+# attached blocks something still had a view of when their with block ended,
+# closed once nothing does
+_unclosed: List[SharedMemory] = []
+_unclosed_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SharedNodeTable:
+    """
+    Where a NodeTable's columns are in shared memory, small enough to pickle
+    """
+    name: str
+    layout: Dict[str, ArrayLayoutType]
+    types: List[str]
+    subcats: List[str]
+    arrow_types: List[str]
+
+    @property
+    def nbytes(self) -> int:
+        return max(
+            (offset + int(np.prod(shape))*np.dtype(dtype).itemsize
+             for offset, dtype, shape in self.layout.values()),
+            default=0
+        )
+
+
+@contextmanager
+def shared_node_table(nodes: NodeTable) -> Iterator[SharedNodeTable]:
+    """
+    nodes copied into a new shared memory block, for the with block
+
+    The block is unlinked at the end, processes still attached keep their
+    view until they detach
+    """
+    arrays = {name: np.ascontiguousarray(getattr(nodes, name)) for name in ARRAY_FIELDS}
+    for name in STRING_FIELDS:
+        arrays[f"{name}.utf8"], arrays[f"{name}.offsets"] = \
+            pack_strings(getattr(nodes, name))
+    layout, size = array_layout(arrays)
+
+    shm = SharedMemory(create=True, size=max(size, 1))
+    try:
+        write_arrays(shm.buf, arrays, layout)
+        yield SharedNodeTable(
+            shm.name, layout, *(list(getattr(nodes, name)) for name in CATEGORY_FIELDS))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _close(shm: SharedMemory) -> None:
+    with _unclosed_lock:
+        for block in [shm, *_unclosed]:
+            try:
+                block.close()
+            except BufferError:  # arrays of it are still about
+                if block is shm:
+                    _unclosed.append(block)
+            else:
+                if block is not shm:
+                    _unclosed.remove(block)
+
+
+@contextmanager
+def attached_node_table(shared: SharedNodeTable) -> Iterator[NodeTable]:
+    """
+    The shared table, its arrays read-only views of the shared memory
+
+    Only good for the with block, copy anything that's needed after it. The
+    block is unmapped at the end, or if some of its arrays are still about,
+    by a later attach once they aren't
+    """
+    shm = SharedMemory(shared.name)
+    try:
+        columns = array_views(shm.buf, shared.layout, writeable=False)
+        for name in STRING_FIELDS:
+            columns[name] = unpack_strings(
+                columns.pop(f"{name}.utf8"), columns.pop(f"{name}.offsets"))
+        nodes = NodeTable(
+            **columns, **{name: getattr(shared, name) for name in CATEGORY_FIELDS})
+        # the views have to be gone before the block can be closed
+        del columns
+        yield nodes
+    finally:
+        nodes = None
+        _close(shm)
@@ -0,0 +1,84 @@
+"""
+Text sizes, measured once per process
+
+Getting a Text's window extent lays it out with the figure's renderer, and
+matplotlib's own metrics cache is per renderer, so every new figure measures
+every title again. Here each (string, font, alignment, dpi) is measured once
+on a scratch figure and reused by every figure after, across all the maps a
+batch worker renders.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from threading import Lock
+from typing import Iterable, Tuple
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
+from matplotlib.text import Text
+import numpy as np
+
+
+TEXT_CACHE_SIZE = 1 << 16
+
+# string, font family, size, weight, style, ha, va, dpi
+TextKeyType = Tuple[str, Tuple[str, ...], float, str, str, str, str, float]
+# x0, y0, x1, y1 of the text in pixels, relative to where it's anchored
+ExtentType = Tuple[float, float, float, float]
+
+# the scratch renderers aren't safe to share between threads
+_measure_lock = Lock()
+
+
+def text_key(text: Text, dpi: float) -> TextKeyType:
+    """
+    Everything about text that changes its size
+    """
+    font = text.get_fontproperties()
+    return (
+        text.get_text(),
+        tuple(font.get_family()),
+        font.get_size_in_points(),
+        str(font.get_weight()),
+        font.get_style(),
+        text.get_horizontalalignment(),
+        text.get_verticalalignment(),
+        dpi
+    )
+
+
+@lru_cache(maxsize=None)
+def _scratch_figure(dpi: float) -> Figure:
+    fig = Figure(dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def text_extent(key: TextKeyType) -> ExtentType:
+    """
+    The extent of the text described by key (see text_key), relative to its
+    anchor
+    """
+    string, family, size, weight, style, ha, va, dpi = key
+    fig = _scratch_figure(dpi)
+    text = Text(
+        0, 0, string,
+        fontproperties=FontProperties(family=list(family), size=size, weight=weight, style=style),
+        ha=ha,
+        va=va,
+        transform=fig.dpi_scale_trans
+    )
+    text.set_figure(fig)
+    with _measure_lock:
+        extent = text.get_window_extent(fig.canvas.get_renderer(), dpi=dpi)
+    return tuple(extent.extents)
+
+
+def text_boxes(texts: Iterable[Text], anchors: np.ndarray, dpi: float) -> np.ndarray:
+    """
+    (n, 4) x0, y0, x1, y1 window extents of texts, anchored at the (n, 2)
+    display positions anchors
+    """
+    extents = np.array([text_extent(text_key(text, dpi)) for text in texts]).reshape(-1, 4)
+    return extents + np.tile(np.asarray(anchors, dtype=float).reshape(-1, 2), 2)